@@ -2,4 +2,5 @@ from .auth import *  # noqa
 from .client import Client, SyncClient  # noqa
 from .heartbeat import *  # noqa
 from .predicate import *  # noqa
+from .serializer import *  # noqa
 from .server import Server  # noqa
@@ -0,0 +1,88 @@
+import asyncio
+import collections
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of the last ``window`` calls sent to a peer.
+    Once at least ``minimum_calls`` were made and the rate of those failing
+    with one of ``failure_on`` reaches ``failure_rate``, the circuit opens
+    and calls fail fast. After ``reset_timeout`` seconds, up to ``probes``
+    calls at a time are let through: the circuit closes when one succeeds,
+    and opens again when one fails.
+    """
+
+    def __init__(
+        self,
+        failure_rate=0.5,
+        window=20,
+        minimum_calls=5,
+        reset_timeout=5,
+        probes=1,
+        failure_on=(asyncio.TimeoutError,),
+    ):
+        self.failure_rate = failure_rate
+        self.minimum_calls = minimum_calls
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.failure_on = failure_on
+        # True for each failure
+        self.outcomes = collections.deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = None
+        self.probing = 0
+
+    def allow(self):
+        """
+        Returns the state a call is sent in, to record its outcome with,
+        or None when the call must fail fast.
+        """
+        if self.state == OPEN:
+            if time.monotonic() < self.opened_at + self.reset_timeout:
+                return None
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self.probing >= self.probes:
+                return None
+            self.probing += 1
+        return self.state
+
+    def record(self, state, failed):
+        """
+        Record the outcome of a call sent in ``state``, ``failed`` is None
+        when the call was cancelled. Returns the state of the circuit.
+        """
+        if state != self.state:
+            # outcome of a call sent before the last transition
+            return self.state
+        if state == HALF_OPEN:
+            self.probing = max(self.probing - 1, 0)
+            if failed:
+                self._open()
+            elif failed is not None:
+                self.state = CLOSED
+                self.outcomes.clear()
+        elif failed is not None:
+            self.outcomes.append(failed)
+            if len(self.outcomes) >= self.minimum_calls and sum(
+                self.outcomes
+            ) >= self.failure_rate * len(self.outcomes):
+                self._open()
+        return self.state
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probing = 0
+        self.outcomes.clear()
+
+
+__all__ = ('CircuitBreaker',)
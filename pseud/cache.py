@@ -0,0 +1,63 @@
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    LRU cache of results of rpc-callables, keys start with the name
+    of the rpc-callable followed by its packed arguments.
+    Entries expire after the ttl of their rpc-callable, and the least
+    recently used are evicted once ``max_size`` bytes are exceeded.
+    Cached values are shared between callers, they must not be mutated.
+    Metrics are counted under ``name``.
+    """
+
+    def __init__(self, max_size, metrics, name='cache'):
+        self.max_size = max_size
+        self.metrics = metrics
+        self.name = name
+        # key -> (value, size, expiration)
+        self.entries = OrderedDict()
+        self.size = 0
+        # bumped by every invalidation, results of calls sent before
+        # are not stored.
+        self.generation = 0
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None or entry[2] <= time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.metrics[f'{self.name}_misses'] += 1
+            return default
+        self.entries.move_to_end(key)
+        self.metrics[f'{self.name}_hits'] += 1
+        return entry[0]
+
+    def set(self, key, value, size, ttl, generation):
+        if generation != self.generation or size > self.max_size:
+            return
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = (value, size, time.monotonic() + ttl)
+        self.size += size
+        while self.size > self.max_size:
+            self._remove(next(iter(self.entries)))
+            self.metrics[f'{self.name}_evictions'] += 1
+
+    def invalidate(self, prefix=''):
+        """
+        Drop results of rpc-callables whose name starts with ``prefix``.
+        """
+        self.generation += 1
+        for key in [key for key in self.entries if key[0].startswith(prefix)]:
+            self._remove(key)
+
+    def _remove(self, key):
+        self.size -= self.entries.pop(key)[1]
+
+
+__all__ = ('ResultCache',)
@@ -1,15 +1,20 @@
 import asyncio
-import builtins
 import logging
-import pprint
 import uuid
 
 import zmq
 import zope.interface
 
-from . import interfaces
-from .common import BaseRPC, format_remote_traceback, internal_exceptions
-from .interfaces import VERSION, WORK, IClient
+from .common import BaseRPC
+from .interfaces import (
+    CACHE_POLICIES_LOCATOR,
+    IDEMPOTENT_ROUTES_LOCATOR,
+    SCHEMA_LOCATOR,
+    VERSION,
+    WORK,
+    IClient,
+)
+from .pubsub import Subscriber
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +27,41 @@ class Client(BaseRPC):
         if routing_id:
             raise TypeError('routing_id argument is prohibited')
         super().__init__(peer_routing_id=peer_routing_id, **kw)
+        self.subscriber = Subscriber(self)
+
+    async def fetch_schema(self):
+        self.route_schemas = await self.send_work(self.peer_routing_id, SCHEMA_LOCATOR)
+        if self.cache is not None:
+            self.cache_policies = await self.send_work(
+                self.peer_routing_id, CACHE_POLICIES_LOCATOR
+            )
+        if self.retry_policy is not None or self.retry_policies:
+            self.idempotent_routes = frozenset(
+                await self.send_work(self.peer_routing_id, IDEMPOTENT_ROUTES_LOCATOR)
+            )
+        return self.route_schemas
+
+    def connect_subscriber(self, endpoint):
+        """
+        Connect the SUB socket to the publisher of the server,
+        secured like the RPC socket.
+        """
+        self.subscriber.connect(endpoint)
+
+    def subscribe(self, prefix):
+        """
+        Returns an async iterator over the ``(topic, value)``
+        published under given topic prefix.
+        """
+        return self.subscriber.subscribe(prefix)
+
+    async def start(self):
+        await super().start()
+        await self.subscriber.start()
+
+    async def stop(self):
+        await self.subscriber.stop()
+        await super().stop()
 
 
 @zope.interface.implementer(IClient)
@@ -43,39 +83,33 @@ class SyncClient(BaseRPC):
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug(
                 'Sending work: {!r} {}'.format(
-                    message[:-1], pprint.pformat(self.packer.unpackb(message[-1]))
+                    message[:3], self._format_body(message[3:], self.codec)
                 )
             )
         response = self.send_message(message)
         return response
 
+    def fetch_schema(self):
+        self.route_schemas = self.send_work(self.peer_routing_id, SCHEMA_LOCATOR)
+        return self.route_schemas
+
     def _prepare_work(self, name, *args, **kw):
-        work = self.packer.packb((name, args, kw))
+        work = self._dumps(self._compile_work(name, args, kw), self.codec)
         uid = uuid.uuid4().bytes
-        message = [VERSION, uid, WORK, work]
+        message = [VERSION, uid, WORK + self.codec, *work]
         return message, uid
 
-    def _handle_ok(self, message, message_uuid):
-        value = self.packer.unpackb(message)
+    async def _handle_ok(self, frames, message_uuid, codec=b''):
+        value = self._loads(frames, codec)
         logger.debug(f'SyncClient result {value!r} from {message_uuid!r}')
         return value
 
-    def _handle_error(self, message, message_uuid):
-        value = self.packer.unpackb(message)
-        klass, message, traceback = value
-        full_message = '\n'.join((format_remote_traceback(traceback), message))
-        try:
-            exception = getattr(builtins, klass)(full_message)
-        except AttributeError as err:
-            if klass in internal_exceptions:
-                raise getattr(interfaces, klass)(full_message) from err
-            else:
-                # Not stdlib Exception
-                # fallback on something that expose informations received
-                # from remote worker
-                raise Exception('\n'.join((klass, full_message))) from err
-        else:
-            raise exception
+    async def _handle_error(self, frames, message_uuid, codec=b''):
+        value = self._loads(frames, codec)
+        raise self._build_exception(value)
+
+    async def _handle_stream_item(self, frames, message_uuid, codec=b''):
+        raise NotImplementedError('SyncClient can not consume streams')
 
     def send_message(self, message):
         self.socket.send_multipart(message)
@@ -3,14 +3,18 @@ import builtins
 import contextlib
 import datetime as dt
 import functools
+import hashlib
 import inspect
+import itertools
 import logging
 import pprint
-import sys
 import textwrap
+import time
 import traceback
 import uuid
-from collections import Counter
+import weakref
+from collections import Counter, OrderedDict
+from copy import deepcopy
 
 import zmq
 import zmq.asyncio
@@ -18,29 +22,103 @@ import zope.component
 import zope.interface
 
 from . import interfaces
+from .breaker import CLOSED
+from .cache import ResultCache
+from .durable import DurableLog
 from .interfaces import (
     AUTHENTICATED,
+    CACHE_POLICIES_LOCATOR,
+    CONDITIONAL_WORK,
+    CREDIT,
     EMPTY_DELIMITER,
     ERROR,
     HEARTBEAT,
     HELLO,
+    IDEMPOTENT_ROUTES_LOCATOR,
+    INVALIDATE,
+    MULTI_REPLY,
+    NOT_MODIFIED,
+    NOTIFY,
     OK,
+    RELEASE_REF_LOCATOR,
+    REMOTE_REF_PREFIX,
+    SCHEMA_LOCATOR,
+    STREAM_CANCEL,
+    STREAM_END,
+    STREAM_ITEM,
+    STREAM_WORK,
     UNAUTHORIZED,
     VERSION,
+    VERSION_2,
+    WHOAMI_LOCATOR,
     WORK,
+    WORK_BATCH,
+    CircuitOpenError,
     IAuthenticationBackend,
     IHeartbeatBackend,
+    ISerializer,
     ServiceNotFoundError,
+    UnsupportedSerializerError,
 )
 from .packer import Packer
-from .utils import create_local_registry, get_rpc_callable, register_rpc
+from .remote import (
+    REMOTE_HANDLE_CODE,
+    RemoteHandle,
+    RemoteProxy,
+    RemoteRef,
+    RemoteRefTable,
+)
+from .retry import RetryBudget, RetryPolicy
+from .serializer import RawSerializer
+from .shm import SharedMemoryTransport, is_flagged, unflag_codec
+from .stream import (
+    MAX_CREDIT,
+    CreditWindow,
+    InboundStream,
+    ResponseStream,
+    decode_credit,
+    encode_credit,
+)
+from .utils import (
+    RPCCallable,
+    Versioned,
+    create_local_registry,
+    get_exception_class,
+    get_exception_name,
+    get_rpc_cache_policies,
+    get_rpc_callable,
+    get_rpc_idempotent_routes,
+    get_rpc_schema,
+    register_exception,
+    register_rpc,
+)
 
 logger = logging.getLogger(__name__)
 
 _marker = object()
 
+# endpoint -> rpc bound to it, for inproc endpoints of this process
+_local_rpcs = weakref.WeakValueDictionary()
+
 MAX_EHOSTUNREACH_RETRY = 3
 
+TRACEBACK_MODES = ('full', 'truncated', 'none')
+# number of innermost frames kept by the truncated traceback mode
+TRUNCATED_TRACEBACK_LIMIT = 3
+
+# messages running an rpc-callable
+WORK_TYPES = (WORK, STREAM_WORK, WORK_BATCH, NOTIFY, CONDITIONAL_WORK)
+# messages whose reply can be sent again to a retry
+REPLAYABLE_WORK_TYPES = (WORK, WORK_BATCH, CONDITIONAL_WORK)
+
+# size in bytes of version tags computed from encoded results
+VERSION_TAG_SIZE = 16
+
+# number of items of a container looked at to estimate its size
+SIZE_ESTIMATION_SAMPLE = 16
+# levels of containers looked at in a result, or an argument
+SIZE_ESTIMATION_DEPTH = 2
+
 internal_exceptions = tuple(
     name
     for name in dir(interfaces)
@@ -89,6 +167,62 @@ def handle_result(future):
         raise
 
 
+def estimate_size(obj, depth=SIZE_ESTIMATION_DEPTH):
+    """
+    Cheap estimation of the encoded size of given object,
+    only looks at the first levels of containers, and samples big ones.
+    """
+    if isinstance(obj, (bytes, bytearray, str)):
+        return len(obj)
+    if isinstance(obj, memoryview):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        obj = obj.values()
+    elif not isinstance(obj, (list, tuple, set, frozenset)):
+        return 8
+    size = len(obj)
+    if not depth or not size:
+        return size * 8
+    sample = list(itertools.islice(obj, SIZE_ESTIMATION_SAMPLE))
+    total = sum(estimate_size(item, depth - 1) for item in sample)
+    return total * size // len(sample)
+
+
+class RateLimiter:
+    """
+    Token bucket allowing ``rate`` events per second.
+    Keeps count of refused events. ``None`` disables the limit.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.monotonic()
+        self.suppressed = 0
+
+    def allow(self):
+        if self.rate is None:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.suppressed += 1
+        return False
+
+
+def split_upload(args):
+    """
+    An async iterable passed as first argument is streamed to the
+    rpc-callable, instead of being sent with the other arguments.
+    """
+    if args and hasattr(args[0], '__aiter__'):
+        return args[0], args[1:]
+    return None, args
+
+
 async def read_forever(socket, callback, copy=False):
     while True:
         result = await socket.recv_multipart(copy=copy)
@@ -96,10 +230,11 @@ async def read_forever(socket, callback, copy=False):
 
 
 class AttributeWrapper:
-    def __init__(self, rpc, name=None, user_id=None):
+    def __init__(self, rpc, name=None, user_id=None, send=None):
         self.rpc = rpc
         self._part_names = name.split('.') if name is not None else []
         self.user_id = user_id
+        self.send = send if send is not None else rpc.send_work
 
     def __getattr__(self, name, default=_marker):
         try:
@@ -120,7 +255,58 @@ class AttributeWrapper:
 
     def __call__(self, *args, **kw):
         user_id = self.user_id or self.rpc.peer_routing_id
-        return self.rpc.send_work(user_id, self.name, *args, **kw)
+        return self.send(user_id, self.name, *args, **kw)
+
+
+class Batch:
+    """
+    Collects calls, sent as a single WORK_BATCH message when the
+    ``async with`` block exits. Every call returns a future of its own result.
+    With ``ordered`` the peer runs them one after the other,
+    otherwise concurrently.
+    """
+
+    def __init__(self, rpc, user_id, ordered=True):
+        self.rpc = rpc
+        self.user_id = user_id
+        self.ordered = ordered
+        self.calls = []
+        self.futures = []
+
+    def __getattr__(self, name):
+        return AttributeWrapper(
+            self.rpc, name=name, user_id=self.user_id, send=self._add_call
+        )
+
+    def _add_call(self, user_id, name, *args, **kw):
+        future = self.rpc.loop.create_future()
+        self.calls.append(self.rpc._compile_work(name, args, kw))
+        self.futures.append(future)
+        return future
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        calls, futures, self.calls, self.futures = self.calls, self.futures, [], []
+        if exc_type is not None:
+            for future in futures:
+                future.cancel()
+            return
+        if not calls:
+            return
+        try:
+            results = await self.rpc.send_batch(self.user_id, calls, self.ordered)
+        except Exception as exc:
+            # the batch failed as a whole
+            for future in futures:
+                future.set_exception(exc)
+            return
+        for future, (succeeded, value) in zip(futures, results):
+            if succeeded:
+                future.set_result(value)
+            else:
+                future.set_exception(self.rpc._build_exception(value))
 
 
 class BaseRPC:
@@ -141,6 +327,30 @@ class BaseRPC:
         proxy_to=None,
         registry=None,
         translation_table=None,
+        serializer='msgpack',
+        accepted_serializers=('msgpack', 'raw'),
+        traceback_mode='full',
+        error_log_rate=10,
+        offload_threshold=None,
+        executor=None,
+        loop_lag_interval=None,
+        stream_window=64,
+        push_window=None,
+        reply_batch_size=None,
+        reply_batch_window=0,
+        cache_size=None,
+        memo_size=None,
+        conditional_size=2**24,
+        reply_cache_size=None,
+        reply_cache_window=60,
+        retry_policy=None,
+        circuit_breaker=None,
+        durable_log=None,
+        shared_memory_threshold=None,
+        shared_memory_dir='/dev/shm',
+        local_dispatch=False,
+        local_copy=True,
+        work_version=VERSION_2,
     ):
         self.user_id = user_id
         self.routing_id = routing_id
@@ -169,6 +379,128 @@ class BaseRPC:
         )
         self.socket: zmq.Socket | None = None
         self.packer = Packer(translation_table)
+        self.packer.register_ext_handler(
+            REMOTE_HANDLE_CODE,
+            RemoteHandle,
+            lambda handle: handle.ref_id.encode('ascii'),
+            lambda data: RemoteHandle(data.decode('ascii')),
+        )
+        self.serializer = serializer
+        self.codec = zope.component.getAdapter(self, ISerializer, name=serializer).code
+        # codec byte -> serializer, only those are decoded from peers.
+        self.serializers = {}
+        for name in {serializer, *accepted_serializers}:
+            plugin = zope.component.getAdapter(self, ISerializer, name=name)
+            self.serializers[plugin.code] = plugin
+        # codec announced by each peer, reused to send them work.
+        self.peer_codecs = {}
+        # name of rpc-callable -> parameters the peer accepts positionally
+        self.route_schemas = {}
+        if traceback_mode not in TRACEBACK_MODES:
+            raise ValueError(f'traceback_mode must be one of {TRACEBACK_MODES}')
+        self.traceback_mode = traceback_mode
+        self.error_log_limiter = RateLimiter(error_log_rate)
+        # payloads bigger than this number of bytes are encoded and decoded
+        # in a worker thread, to keep the loop responsive.
+        self.offload_threshold = offload_threshold
+        self.executor = executor
+        self.loop_lag_interval = loop_lag_interval
+        self.loop_lag_monitor = None
+        self.metrics = Counter()
+        # (routing_id, message_uuid) -> task sending items of a stream
+        self.stream_tasks = {}
+        # message_uuid -> items received for a call awaited as a whole
+        self.stream_buffers = {}
+        # number of items the peer may send before waiting for more credit,
+        # ``None`` disables the flow control of streams consumed by this rpc.
+        self.stream_window = stream_window
+        # (routing_id, message_uuid) -> credit of a stream being sent
+        self.stream_windows = {}
+        # credit received ahead of its WORK -> (credit, expiration)
+        self.pending_credits = OrderedDict()
+        # (routing_id, message_uuid) -> items streamed by the caller of a work
+        self.inbound_streams = {}
+        # maximum number of calls awaiting a reply per peer, ``None`` is unlimited
+        self.push_window = push_window
+        self.push_credits = {}
+        # replies to a peer are coalesced up to ``reply_batch_size``, or until
+        # ``reply_batch_window`` seconds elapsed. ``None`` sends them one by one.
+        self.reply_batch_size = reply_batch_size
+        self.reply_batch_window = reply_batch_window
+        # routing_id -> replies waiting to be sent
+        self.pending_replies = {}
+        self.reply_flushers = {}
+        # results of cacheable rpc-callables of the peer are kept
+        # up to ``cache_size`` bytes, ``None`` disables the cache.
+        self.cache = ResultCache(cache_size, self.metrics) if cache_size else None
+        # name of rpc-callable -> seconds its results can be cached
+        self.cache_policies = {}
+        # encoded results of memoized rpc-callables are kept up to
+        # ``memo_size`` bytes, ``None`` disables memoization.
+        self.memo = ResultCache(memo_size, self.metrics, 'memo') if memo_size else None
+        # memoization key -> task computing the shared result
+        self.memo_inflight = {}
+        # results of conditional calls with their version tag,
+        # kept up to ``conditional_size`` bytes.
+        self.versioned_results = ResultCache(
+            conditional_size, self.metrics, 'conditional'
+        )
+        # message_uuid -> (key, versioned result) of conditional calls
+        self.conditional_calls = {}
+        # replies sent within ``reply_cache_window`` seconds are kept up to
+        # ``reply_cache_size`` bytes, and sent again to retries of their work
+        # instead of running it twice. ``None`` disables it.
+        self.reply_cache = (
+            ResultCache(reply_cache_size, self.metrics, 'duplicate')
+            if reply_cache_size
+            else None
+        )
+        self.reply_cache_window = reply_cache_window
+        # calls of idempotent rpc-callables of the peer are retried following
+        # ``retry_policies[name]``, or ``retry_policy``. ``None`` disables it.
+        self.retry_policy = retry_policy
+        self.retry_policies = {}
+        # bounds the retries of all policies without a budget of their own
+        self.retry_budget = RetryBudget()
+        self.idempotent_routes = frozenset()
+        # factory of the :py:class:`pseud.breaker.CircuitBreaker` of each peer,
+        # ``None`` disables them.
+        self.circuit_breaker = circuit_breaker
+        # routing_id -> circuit breaker
+        self.circuit_breakers = {}
+        # path of the sqlite database where durable work is kept
+        # until its peer replied, ``None`` disables durable calls.
+        self.durable_log = DurableLog(durable_log) if durable_log else None
+        # tasks sending again the durable work of a previous run
+        self.durable_replays = None
+        # objects returned to peers as :py:class:`pseud.remote.RemoteRef`
+        self.remote_refs = RemoteRefTable(self.metrics)
+        # body frames bigger than ``shared_memory_threshold`` bytes are sent
+        # through shared memory, as long as every endpoint is on this host.
+        # ``None`` disables it, and refuses such messages from peers.
+        self.shared_memory = (
+            SharedMemoryTransport(
+                shared_memory_threshold,
+                self.metrics,
+                shared_memory_dir,
+                timeout=max(self.timeout * 2, 1),
+            )
+            if shared_memory_threshold is not None
+            else None
+        )
+        self.colocated = True
+        # calls to a peer bound in this process to an inproc endpoint
+        # skip serialization with ``local_dispatch``, arguments and results
+        # are deep copied with ``local_copy``.
+        self.local_dispatch = local_dispatch
+        self.local_copy = local_copy
+        self.local_peer = None
+        # identity this rpc authenticated with on the local peer
+        self.local_user_id = None
+        # layout of WORK messages, servers older than 2.0 only accept ``v1``
+        if work_version not in (VERSION, VERSION_2):
+            raise ValueError(f'work_version must be {VERSION!r} or {VERSION_2!r}')
+        self.work_version = work_version
 
     def __getattr__(self, name, default=_marker):
         try:
@@ -186,6 +518,79 @@ class BaseRPC:
     def send_to(self, user_id):
         return AttributeWrapper(self, user_id=user_id)
 
+    def multicast(self, user_ids, timeout=None, reply=True):
+        """
+        ``await server.multicast(user_ids).name(...)`` calls the rpc-callable
+        of every given peer. Without ``reply`` peers are notified.
+        """
+
+        def send(_, name, *args, **kw):
+            return self.send_multicast(user_ids, name, args, kw, timeout, reply)
+
+        return AttributeWrapper(self, send=send)
+
+    def batch(self, ordered=True, user_id=None):
+        """
+        ``async with client.batch() as batch:`` sends all calls
+        made on ``batch`` in a single message.
+        """
+        return Batch(self, user_id or self.peer_routing_id, ordered)
+
+    @property
+    def notify(self):
+        """
+        Fire-and-forget calls, e.g. ``await client.notify.name(event)``
+        returns once the message is sent.
+        """
+        return AttributeWrapper(self, send=self.send_notification)
+
+    @property
+    def durable(self):
+        """
+        ``await client.durable.name()`` is not lost if this process
+        stops before the peer replied, see :py:meth:`send_durable_work`.
+        """
+        return AttributeWrapper(self, send=self.send_durable_work)
+
+    @property
+    def conditional(self):
+        """
+        ``await client.conditional.name()`` only downloads the result
+        if it changed since the previous identical call.
+        """
+        return AttributeWrapper(self, send=self.send_conditional_work)
+
+    def retrying(self, policy=3):
+        """
+        ``await client.retrying(3).name()`` sends the call again, with the
+        same uuid, when it times out. Peers keeping a ``reply_cache`` then
+        answer a retry without running the work twice.
+        ``policy`` is a :py:class:`pseud.retry.RetryPolicy` or a number
+        of attempts.
+        """
+        if not isinstance(policy, RetryPolicy):
+            policy = RetryPolicy(policy)
+
+        def send(user_id, name, *args, **kw):
+            return self.send_work_retrying(user_id, name, args, kw, policy)
+
+        return AttributeWrapper(self, send=send)
+
+    @property
+    def stream(self):
+        """
+        Iterates over the items of generator rpc-callables as they are
+        produced, e.g. ``async for item in client.stream.name()``.
+        """
+        return AttributeWrapper(self, send=self.stream_work)
+
+    @property
+    def raw(self):
+        """
+        Calls raw rpc-callables, e.g. ``await client.raw.name(buffer)``.
+        """
+        return AttributeWrapper(self, send=self.send_raw_work)
+
     def _setup_socket(self, probing=False):
         if self.socket is None:
             self.socket = self.context.socket(self.socket_type)
@@ -206,19 +611,118 @@ class BaseRPC:
     def connect(self, endpoint):
         self._setup_socket(probing=True)
         self.socket.connect(endpoint)
+        endpoint = self._check_colocated(endpoint)
+        if self.local_dispatch and endpoint.startswith('inproc://'):
+            peer = _local_rpcs.get(endpoint)
+            if peer is not None and peer.routing_id == self.peer_routing_id:
+                self.local_peer = peer
 
     def bind(self, endpoint):
         self._setup_socket()
         self.socket.bind(endpoint)
+        endpoint = self._check_colocated(endpoint)
+        if endpoint.startswith('inproc://'):
+            _local_rpcs[endpoint] = self
+
+    def _check_colocated(self, endpoint):
+        if isinstance(endpoint, bytes):
+            endpoint = endpoint.decode('utf-8')
+        if not endpoint.startswith(('ipc://', 'inproc://')):
+            # peers may be on another host
+            self.colocated = False
+        return endpoint
 
     def disconnect(self, endpoint):
         self.socket.disconnect(endpoint)
 
-    def _prepare_work(self, user_id, name, *args, **kw):
+    def _dumps(self, obj, codec=b''):
+        return self.serializers[codec].dumps(obj)
+
+    def _loads(self, frames, codec=b''):
+        return self.serializers[codec].loads(frames)
+
+    async def _dumps_async(self, obj, codec=b'', envelope=0):
+        """
+        ``envelope`` is the number of container levels wrapping
+        the payload, e.g. 2 for the ``(args, kw)`` of a work.
+        """
+        if (
+            self.offload_threshold is not None
+            and codec != RawSerializer.code
+            and estimate_size(obj, SIZE_ESTIMATION_DEPTH + envelope)
+            >= self.offload_threshold
+        ):
+            self.metrics['offloaded_dumps'] += 1
+            return await self.loop.run_in_executor(
+                self.executor, self._dumps, obj, codec
+            )
+        return self._dumps(obj, codec)
+
+    async def _loads_async(self, frames, codec=b''):
+        if (
+            self.offload_threshold is not None
+            and codec != RawSerializer.code
+            and sum(map(len, frames)) >= self.offload_threshold
+        ):
+            self.metrics['offloaded_loads'] += 1
+            return await self.loop.run_in_executor(
+                self.executor, self._loads, frames, codec
+            )
+        return self._loads(frames, codec)
+
+    def _format_body(self, frames, codec=b''):
+        try:
+            return pprint.pformat(self._loads(frames, codec))
+        except Exception:
+            return b''.join(map(bytes, frames)).hex()
+
+    def _compile_work(self, name, args, kw, offset=0):
+        """
+        Move keyword arguments to positional ones thanks to the
+        schema published by the peer, key strings are not sent.
+        ``offset`` skips leading parameters which are not sent.
+        """
+        schema = self.route_schemas.get(name)
+        if schema is not None:
+            schema = schema[offset:]
+        if schema and kw:
+            args = list(args)
+            # the caller may use ``kw`` again, e.g. for a local call
+            kw = dict(kw)
+            for param in schema[len(args) :]:
+                if param not in kw:
+                    break
+                args.append(kw.pop(param))
+        if kw or schema is None:
+            return (name, tuple(args), kw)
+        return (name, tuple(args))
+
+    async def _prepare_work(self, user_id, name, args, kw, work_type=WORK, version=None):
+        """
+        ``version`` is the layout of the message, ``work_version`` by default.
+        """
         routing_id = self.auth_backend.get_routing_id(user_id)
-        work = self.packer.packb((name, args, kw))
+        codec = self.peer_codecs.get(routing_id, self.codec)
+        # The stream of STREAM_WORK is the first parameter of the rpc-callable.
+        locator, *arguments = self._compile_work(
+            name, args, kw, offset=int(work_type == STREAM_WORK)
+        )
         uid = uuid.uuid4().bytes
-        message = [routing_id, EMPTY_DELIMITER, VERSION, uid, WORK, work]
+        if (version or self.work_version) == VERSION:
+            work = await self._dumps_async((locator, *arguments), codec, envelope=2)
+            message = [routing_id, EMPTY_DELIMITER, VERSION, uid, work_type + codec]
+            return [*message, *work], uid
+        # v2 layout, the locator has its own frame.
+        work = await self._dumps_async(tuple(arguments), codec, envelope=2)
+        message = [
+            routing_id,
+            EMPTY_DELIMITER,
+            VERSION_2,
+            uid,
+            work_type + codec,
+            locator.encode('utf-8'),
+            *work,
+        ]
         return message, uid
 
     def create_timeout_detector(self, uuid):
@@ -231,25 +735,32 @@ class BaseRPC:
             del self.future_pool[uuid]
         except KeyError:
             pass
+        self.stream_buffers.pop(uuid, None)
+        self.conditional_calls.pop(uuid, None)
 
     async def on_socket_ready(self, response):
-        if len(response) == 4:
+        if self.socket_type == zmq.REQ:
             # From REQ socket
-            version, message_uuid, message_type = map(bytes, response[:-1])
-            message = response[-1]
+            version, message_uuid, message_type = map(bytes, response[:3])
+            frames = response[3:]
             routing_id = None
         elif len(response) == 2:
             # PROBING Messages
             routing_id = bytes(response[0])
             version = b''
             message_type = None
-            message = response[-1]
+            frames = response[1:]
         else:
             # from ROUTER socket
             routing_id, delimiter, version, message_uuid, message_type = map(
-                bytes, response[:-1]
+                bytes, response[:5]
             )
-            message = response[-1]
+            frames = response[5:]
+        message = frames[0]
+        codec = b''
+        if message_type is not None:
+            # Optional header byte telling which serializer encoded the body
+            message_type, codec = message_type[:1], message_type[1:]
         try:
             user_id = message.get(b'User-Id').encode('utf-8')
         except zmq.error.ZMQError:
@@ -263,16 +774,19 @@ class BaseRPC:
                 'Message received for {}: '
                 'meta: {} message: {}'.format(
                     (self.user_id.hex() if self.user_id is not None else user_id.hex()),
-                    b''.join(map(bytes, response[:-1])).hex(),
-                    pprint.pformat(self.packer.unpackb(response[-1]))
-                    if message_type in (WORK, OK, HELLO)
-                    else bytes(response[-1]).hex(),
+                    b''.join(map(bytes, response[: -len(frames)])).hex(),
+                    self._format_body(
+                        frames[1:] if version == VERSION_2 else frames, codec
+                    )
+                    if message_type in (*WORK_TYPES, OK, HELLO)
+                    and codec in self.serializers
+                    else bytes(message).hex(),
                 )
             )
         if message_type is None:
             # PROBING message
             return
-        assert version == VERSION
+        assert version in (VERSION, VERSION_2)
         if not self.auth_backend.is_authenticated(user_id):
             if message_type != HELLO:
                 return await self.auth_backend.handle_authentication(
@@ -283,17 +797,79 @@ class BaseRPC:
             )
 
         await self.heartbeat_backend.handle_heartbeat(user_id, routing_id)
+        if is_flagged(codec) and self.shared_memory is not None:
+            try:
+                frames = self.shared_memory.decode(frames)
+            except Exception:
+                logger.exception('Shared memory segments can not be mapped')
+                return
+            codec = unflag_codec(codec)
+        if codec not in self.serializers:
+            return await self._handle_unsupported_codec(
+                message_type, codec, routing_id, message_uuid
+            )
         return await self.dispatch(
-            message_type, message, routing_id, user_id, message_uuid
+            message_type, frames, routing_id, user_id, message_uuid, codec, version
         )
 
-    async def dispatch(self, message_type, message, routing_id, user_id, message_uuid):
-        if message_type == WORK:
-            return await self._handle_work(message, routing_id, user_id, message_uuid)
+    async def dispatch(
+        self,
+        message_type,
+        frames,
+        routing_id,
+        user_id,
+        message_uuid,
+        codec=b'',
+        version=VERSION,
+    ):
+        if (routing_id, message_uuid) in self.inbound_streams and message_type in (
+            STREAM_ITEM,
+            STREAM_END,
+            ERROR,
+        ):
+            return await self._handle_inbound(
+                message_type, frames, routing_id, message_uuid, codec
+            )
+        if message_type in WORK_TYPES:
+            if routing_id is not None:
+                self.peer_codecs[routing_id] = codec
+            if self.reply_cache is not None and message_type in REPLAYABLE_WORK_TYPES:
+                reply = self.reply_cache.get(
+                    self._reply_cache_key(routing_id, user_id, message_uuid), _marker
+                )
+                if reply is not _marker:
+                    # retry of a work already done
+                    return await self.send_message(
+                        [routing_id, EMPTY_DELIMITER, VERSION, message_uuid, *reply]
+                    )
+            if message_type == NOTIFY:
+                return await self._handle_notification(frames, user_id, codec, version)
+            if message_type == STREAM_WORK:
+                return await self._handle_stream_work(
+                    frames, routing_id, user_id, message_uuid, codec, version
+                )
+            if message_type == WORK_BATCH:
+                return await self._handle_work_batch(
+                    frames, routing_id, user_id, message_uuid, codec
+                )
+            if message_type == CONDITIONAL_WORK:
+                return await self._handle_conditional_work(
+                    frames, routing_id, user_id, message_uuid, codec
+                )
+            return await self._handle_work(
+                frames, routing_id, user_id, message_uuid, codec, version
+            )
         if message_type == OK:
-            return self._handle_ok(message, message_uuid)
+            return await self._handle_ok(frames, message_uuid, codec)
         if message_type == ERROR:
-            return self._handle_error(message, message_uuid)
+            return await self._handle_error(frames, message_uuid, codec)
+        if message_type == NOT_MODIFIED:
+            return self._handle_not_modified(message_uuid)
+        if message_type == MULTI_REPLY:
+            return await self._handle_multi_reply(frames, routing_id, user_id)
+        if message_type == INVALIDATE:
+            return self._handle_invalidate(frames)
+        message = frames[0]
         if message_type == AUTHENTICATED:
             return await self.auth_backend.handle_authenticated(message)
         if message_type == UNAUTHORIZED:
@@ -304,101 +880,1192 @@ class BaseRPC:
             return self.auth_backend.handle_hello(
                 user_id, routing_id, message_uuid, message
             )
+        if message_type == STREAM_ITEM:
+            return await self._handle_stream_item(frames, message_uuid, codec)
+        if message_type == STREAM_END:
+            return self._handle_stream_end(message_uuid)
+        if message_type == STREAM_CANCEL:
+            return self._handle_stream_cancel(routing_id, message_uuid)
+        if message_type == CREDIT:
+            return self._handle_credit(routing_id, message_uuid, message)
         if message_type == HEARTBEAT:
             # Can ignore, because every message is an heartbeat
             return
         logger.error(f'Unknown message_type received {message_type!r}')
         raise NotImplementedError
 
-    def _handle_ok(self, message, message_uuid):
-        value = self.packer.unpackb(message)
+    async def _handle_unsupported_codec(
+        self, message_type, codec, routing_id, message_uuid
+    ):
+        logger.error(f'Refused message encoded with unsupported codec {codec!r}')
+        if message_type not in (WORK, STREAM_WORK, WORK_BATCH, CONDITIONAL_WORK):
+            return
+        try:
+            raise UnsupportedSerializerError(f'Codec {codec!r} is not accepted')
+        except UnsupportedSerializerError as exc:
+            response = self._encode_error(exc)
+        await self.send_message(
+            [routing_id, EMPTY_DELIMITER, VERSION, message_uuid, ERROR, *response]
+        )
+
+    async def _handle_ok(self, frames, message_uuid, codec=b''):
+        conditional = self.conditional_calls.pop(message_uuid, None)
+        if conditional is not None:
+            # version tag of the result comes first
+            tag, frames = bytes(frames[0]), frames[1:]
+        value = await self._loads_async(frames, codec)
         logger.debug(f'Client result {value!r} from {message_uuid!r}')
-        future = self.future_pool.pop(message_uuid)
+        future = self.future_pool.pop(message_uuid, None)
+        if future is None:
+            logger.warning(f'Result received after timeout for {message_uuid!r}')
+            return
+        if conditional is not None:
+            self.versioned_results.set(
+                conditional[0],
+                Versioned(value, tag),
+                estimate_size(value),
+                float('inf'),
+                self.versioned_results.generation,
+            )
         future.set_result(value)
 
-    def _handle_error(self, message, message_uuid):
-        value = self.packer.unpackb(message)
+    def _handle_not_modified(self, message_uuid):
+        conditional = self.conditional_calls.pop(message_uuid, None)
+        future = self.future_pool.pop(message_uuid, None)
+        if future is None:
+            logger.warning(f'Result received after timeout for {message_uuid!r}')
+            return
+        if conditional is None or conditional[1] is None:
+            future.set_exception(RuntimeError('Not modified, but nothing is known'))
+            return
+        future.set_result(conditional[1].value)
+
+    async def _handle_multi_reply(self, frames, routing_id, user_id):
+        index = self.packer.unpackb(frames[0])
+        position = 1
+        for message_uuid, status, count in index:
+            body = frames[position : position + count]
+            position += count
+            message_type, codec = status[:1], status[1:]
+            if codec not in self.serializers:
+                logger.error(f'Refused reply encoded with unsupported codec {codec!r}')
+                continue
+            await self.dispatch(
+                message_type, body, routing_id, user_id, message_uuid, codec
+            )
+
+    def _handle_invalidate(self, frames):
+        prefix = self.packer.unpackb(frames[0])
+        if self.cache is not None:
+            self.cache.invalidate(prefix)
+
+    async def _handle_error(self, frames, message_uuid, codec=b''):
+        value = await self._loads_async(frames, codec)
         future = self.future_pool.pop(message_uuid, DummyFuture())
-        klass, message, traceback = value
+        future.set_exception(self._build_exception(value))
+
+    def _build_exception(self, value):
+        klass, message, traceback = value[:3]
+        if len(value) > 3:
+            # registered exception sent with its arguments
+            exception_class = get_exception_class(klass, self.registry)
+            if exception_class is not None:
+                try:
+                    exception = exception_class(*value[3])
+                except Exception:
+                    logger.exception(f'Can not rebuild remote exception {klass}')
+                else:
+                    exception.remote_traceback = traceback
+                    if traceback and hasattr(exception, 'add_note'):
+                        exception.add_note(format_remote_traceback(traceback))
+                    return exception
         full_message = '\n'.join((format_remote_traceback(traceback), message))
-        try:
-            exception = getattr(builtins, klass)(full_message)
-        except AttributeError:
-            if klass in internal_exceptions:
-                exception = getattr(interfaces, klass)(full_message)
-                future.set_exception(exception)
-            else:
-                # Not stdlib Exception
-                # fallback on something that expose informations received
-                # from remote worker
-                future.set_exception(Exception('\n'.join((klass, full_message))))
+        exception_class = getattr(builtins, klass, None)
+        if exception_class is None and klass in internal_exceptions:
+            exception_class = getattr(interfaces, klass)
+        if isinstance(exception_class, type) and issubclass(
+            exception_class, BaseException
+        ):
+            try:
+                return exception_class(full_message)
+            except Exception:
+                # e.g. UnicodeDecodeError requires more arguments
+                pass
+        # Not stdlib Exception
+        # fallback on something that expose informations received
+        # from remote worker
+        return Exception('\n'.join((klass, full_message)))
+
+    def _format_traceback(self):
+        if self.traceback_mode == 'none':
+            return ''
+        if self.traceback_mode == 'truncated':
+            return traceback.format_exc(limit=-TRUNCATED_TRACEBACK_LIMIT)
+        return traceback.format_exc()
+
+    def _format_error(self, exc, with_args=True):
+        """
+        Must be called while handling given exception.
+        """
+        error = (exc.__class__.__name__, str(exc), self._format_traceback())
+        if not with_args:
+            return error
+        name = get_exception_name(exc.__class__, self.registry)
+        if name is not None:
+            return (name, error[1], error[2], exc.args)
+        return error
+
+    def _encode_error(self, exc):
+        """
+        Must be called while handling given exception.
+        Errors are always encoded with the default serializer.
+        """
+        error = self._format_error(exc)
+        if len(error) > 3:
+            try:
+                return self._dumps(error)
+            except Exception:
+                logger.warning(f'Arguments of {error[0]} can not be sent')
+        return self._dumps(self._format_error(exc, with_args=False))
+
+    def _log_job_failure(self):
+        if not self.error_log_limiter.allow():
+            return
+        suppressed, self.error_log_limiter.suppressed = (
+            self.error_log_limiter.suppressed,
+            0,
+        )
+        if suppressed:
+            logger.exception(f'Pseud job failed ({suppressed} errors not logged)')
         else:
-            future.set_exception(exception)
+            logger.exception('Pseud job failed')
 
     @property
     def register_rpc(self):
         return functools.partial(register_rpc, registry=self.registry)
 
+    @property
+    def register_exception(self):
+        return functools.partial(register_exception, registry=self.registry)
+
     def _make_context(self):
         instance = zmq.asyncio.Context.instance()
         assert isinstance(instance, zmq.asyncio.Context)
         return instance
 
-    async def _handle_work_proxy(self, locator, args, kw, user_id, message_uuid):
-        worker_callable = get_rpc_callable(
-            locator,
-            registry=self.registry,
-            **self.auth_backend.get_predicate_arguments(user_id),
-        )
+    def _get_worker_callable(self, locator, user_id):
+        predicate_arguments = self.auth_backend.get_predicate_arguments(user_id)
+        if locator == SCHEMA_LOCATOR:
+            return RPCCallable(
+                functools.partial(get_rpc_schema, self.registry, **predicate_arguments),
+                name=SCHEMA_LOCATOR,
+            )
+        if locator == CACHE_POLICIES_LOCATOR:
+            return RPCCallable(
+                functools.partial(
+                    get_rpc_cache_policies, self.registry, **predicate_arguments
+                ),
+                name=CACHE_POLICIES_LOCATOR,
+            )
+        if locator == IDEMPOTENT_ROUTES_LOCATOR:
+            return RPCCallable(
+                functools.partial(
+                    get_rpc_idempotent_routes, self.registry, **predicate_arguments
+                ),
+                name=IDEMPOTENT_ROUTES_LOCATOR,
+            )
+        if locator.startswith(REMOTE_REF_PREFIX):
+            ref_id, _, method = locator[len(REMOTE_REF_PREFIX) :].partition('.')
+            obj = self.remote_refs.get(ref_id, user_id)
+            if not method or method.startswith('_') or not hasattr(obj, method):
+                raise ServiceNotFoundError(locator)
+            return RPCCallable(getattr(obj, method), name=locator)
+        if locator == WHOAMI_LOCATOR:
+            return RPCCallable(
+                lambda user_id: user_id, name=WHOAMI_LOCATOR, with_identity=True
+            )
+        if locator == RELEASE_REF_LOCATOR:
+            return RPCCallable(
+                functools.partial(self.remote_refs.release, owner=user_id),
+                name=RELEASE_REF_LOCATOR,
+            )
+        return get_rpc_callable(locator, registry=self.registry, **predicate_arguments)
+
+    def _resolve_worker_callable(self, locator, user_id):
+        try:
+            return self._get_worker_callable(locator, user_id)
+        except ServiceNotFoundError:
+            if self.proxy_to is None:
+                raise
+            return self.proxy_to._get_worker_callable(locator, user_id)
+
+    async def _call_worker(self, worker_callable, args, kw, user_id):
         if worker_callable.with_identity:
             result = worker_callable(user_id, *args, **kw)
         else:
             result = worker_callable(*args, **kw)
-        if asyncio.iscoroutine(result):
+        if inspect.isawaitable(result):
             result = await result
         return result
 
-    async def _handle_work(self, message, routing_id, user_id, message_uuid):
-        locator, args, kw = self.packer.unpackb(message)
+    async def _finish_result(self, result, user_id, gather=True):
+        """
+        What is sent for the result of an rpc-callable: the value of
+        :py:class:`pseud.utils.Versioned`, a handle of
+        :py:class:`pseud.remote.RemoteRef` owned by ``user_id``, and the
+        items of generators in a tuple, unless they are streamed.
+        """
+        if isinstance(result, Versioned):
+            result = result.value
+        if isinstance(result, RemoteRef):
+            return self.remote_refs.add(result, user_id)
+        if gather:
+            if inspect.isasyncgen(result):
+                return tuple([item async for item in result])
+            if inspect.isgenerator(result):
+                return tuple(result)
+        return result
+
+    async def _handle_work_proxy(self, locator, args, kw, user_id, message_uuid):
+        worker_callable = self._get_worker_callable(locator, user_id)
+        return await self._call_worker(worker_callable, args, kw, user_id)
+
+    async def _unpack_work(
+        self, frames, user_id, codec=b'', version=VERSION, worker_callable=None
+    ):
+        """
+        Returns the callable in charge of the work, and its arguments.
+        With v2 layout arguments are decoded only if the callable is found,
+        unless it is given.
+        """
+        if version == VERSION_2:
+            locator = bytes(frames[0]).decode('utf-8')
+            if worker_callable is None:
+                worker_callable = self._resolve_worker_callable(locator, user_id)
+            if worker_callable.raw != (codec == RawSerializer.code):
+                raise TypeError(
+                    f'{locator!r} must be called with raw.{locator}()'
+                    if worker_callable.raw
+                    else f'{locator!r} is not a raw rpc-callable'
+                )
+            if worker_callable.raw:
+                # handler receives the incoming frame as-is
+                return worker_callable, (self._loads(frames[1:], codec),), {}
+            arguments = await self._loads_async(frames[1:], codec)
+        else:
+            if codec == RawSerializer.code:
+                raise TypeError('Raw work requires v2 layout')
+            work = await self._loads_async(frames, codec)
+            locator, arguments = work[0], work[1:]
+            worker_callable = self._resolve_worker_callable(locator, user_id)
+            if worker_callable.raw:
+                raise TypeError(f'{locator!r} must be called with raw.{locator}()')
+        # keyword arguments are omitted when sent positionally
+        args = arguments[0]
+        kw = arguments[1] if len(arguments) > 1 else {}
+        return worker_callable, args, kw
+
+    async def _handle_work(
+        self, frames, routing_id, user_id, message_uuid, codec=b'', version=VERSION
+    ):
+        # credit granted by the caller ahead of its work, if it consumes a stream
+        credit = self.pending_credits.pop((routing_id, message_uuid), None)
+        worker_callable = None
+        if self.memo is not None and version == VERSION_2:
+            # errors are reported by the regular path
+            with contextlib.suppress(Exception):
+                worker_callable = self._resolve_worker_callable(
+                    bytes(frames[0]).decode('utf-8'), user_id
+                )
+            if worker_callable is not None and worker_callable.memoize:
+                return await self._handle_memoized_work(
+                    worker_callable, frames, routing_id, user_id, message_uuid, codec
+                )
         try:
+            worker_callable, args, kw = await self._unpack_work(
+                frames, user_id, codec, version, worker_callable
+            )
+            result = await self._call_worker(worker_callable, args, kw, user_id)
+        except Exception as exc:
+            self._log_job_failure()
+            response = self._encode_error(exc)
+            status = ERROR
+        else:
+            result = await self._finish_result(result, user_id, gather=False)
+            if inspect.isasyncgen(result) or inspect.isgenerator(result):
+                window = CreditWindow(credit[0]) if credit is not None else None
+                return self._start_stream(
+                    routing_id, message_uuid, result, codec, window
+                )
             try:
-                result = await self._handle_work_proxy(
-                    locator, args, kw, user_id, message_uuid
+                response = await self._dumps_async(result, codec)
+                status = OK + codec
+            except Exception as exc:
+                self._log_job_failure()
+                response = self._encode_error(exc)
+                status = ERROR
+        await self._send_reply(routing_id, message_uuid, status, response, user_id)
+
+    async def _handle_conditional_work(
+        self, frames, routing_id, user_id, message_uuid, codec=b''
+    ):
+        """
+        Frames are the locator, the version tag known by the caller,
+        then arguments. The version tag of the result is either given by
+        the rpc-callable with :py:class:`pseud.utils.Versioned`, or a hash
+        of the encoded result.
+        """
+        known_tag = bytes(frames[1])
+        try:
+            worker_callable, args, kw = await self._unpack_work(
+                [frames[0], *frames[2:]], user_id, codec, VERSION_2
+            )
+            result = await self._call_worker(worker_callable, args, kw, user_id)
+            response = None
+            if isinstance(result, Versioned):
+                result, tag = result
+                tag = tag.encode('utf-8') if isinstance(tag, str) else bytes(tag)
+                result = await self._finish_result(result, user_id)
+            else:
+                result = await self._finish_result(result, user_id)
+                response = await self._dumps_async(result, codec)
+                digest = hashlib.blake2b(digest_size=VERSION_TAG_SIZE)
+                for frame in response:
+                    digest.update(frame)
+                tag = digest.digest()
+            if tag == known_tag:
+                self.metrics['not_modified'] += 1
+                return await self._send_reply(
+                    routing_id, message_uuid, NOT_MODIFIED, [b''], user_id
                 )
-            except ServiceNotFoundError:
-                if self.proxy_to is None:
-                    raise
-                result = await self.proxy_to._handle_work_proxy(
-                    locator, args, kw, user_id, message_uuid
+            if response is None:
+                response = await self._dumps_async(result, codec)
+        except Exception as exc:
+            self._log_job_failure()
+            return await self._send_reply(
+                routing_id, message_uuid, ERROR, self._encode_error(exc), user_id
+            )
+        await self._send_reply(
+            routing_id, message_uuid, OK + codec, [tag, *response], user_id
+        )
+
+    async def _handle_memoized_work(
+        self, worker_callable, frames, routing_id, user_id, message_uuid, codec=b''
+    ):
+        """
+        Identical calls share the same task, its encoded result is then
+        kept for the ttl of the rpc-callable. Keys are made of the raw
+        frames of the arguments, nothing is decoded or encoded on a hit.
+        """
+        key = (
+            worker_callable.name,
+            worker_callable.domain,
+            user_id if worker_callable.with_identity else None,
+            codec,
+            b''.join(map(bytes, frames[1:])),
+        )
+        response = self.memo.get(key, _marker)
+        if response is not _marker:
+            return await self._send_reply(
+                routing_id, message_uuid, OK + codec, response, user_id
+            )
+        inflight = self.memo_inflight.get(key)
+        if inflight is None:
+            inflight = self.memo_inflight[key] = self.loop.create_task(
+                self._run_memoized_work(key, worker_callable, frames, user_id, codec)
+            )
+            inflight.add_done_callback(lambda _: self.memo_inflight.pop(key, None))
+        else:
+            self.metrics['memo_shared'] += 1
+        # the reader is not blocked while the result is computed
+        task = self.loop.create_task(
+            self._reply_memoized_work(inflight, routing_id, user_id, message_uuid)
+        )
+        task.add_done_callback(handle_result)
+
+    async def _run_memoized_work(self, key, worker_callable, frames, user_id, codec):
+        generation = self.memo.generation
+        try:
+            _, args, kw = await self._unpack_work(
+                frames, user_id, codec, VERSION_2, worker_callable
+            )
+            result = await self._call_worker(worker_callable, args, kw, user_id)
+            # a handle is only reachable by the peer it was returned to
+            shared = not isinstance(result, RemoteRef)
+            result = await self._finish_result(result, user_id)
+            response = await self._dumps_async(result, codec)
+        except Exception as exc:
+            # errors are not memoized
+            self._log_job_failure()
+            return ERROR, self._encode_error(exc)
+        if shared:
+            size = sum(len(frame) for frame in response)
+            self.memo.set(key, response, size, worker_callable.memoize, generation)
+        return OK + codec, response
+
+    async def _reply_memoized_work(self, inflight, routing_id, user_id, message_uuid):
+        status, response = await asyncio.shield(inflight)
+        await self._send_reply(routing_id, message_uuid, status, response, user_id)
+
+    async def _handle_stream_work(
+        self, frames, routing_id, user_id, message_uuid, codec=b'', version=VERSION
+    ):
+        """
+        The rpc-callable receives the items streamed by the caller as its
+        first argument, it runs in a task so the reader keeps feeding them.
+        """
+        key = (routing_id, message_uuid)
+        credit = self.pending_credits.pop(key, None)
+        try:
+            worker_callable, args, kw = await self._unpack_work(
+                frames, user_id, codec, version
+            )
+        except Exception as exc:
+            self._log_job_failure()
+            return await self._send_reply(
+                routing_id, message_uuid, ERROR, self._encode_error(exc)
+            )
+        inbound = InboundStream(
+            self.timeout,
+            self.stream_window,
+            functools.partial(self._send_credit, routing_id, message_uuid),
+        )
+        self.inbound_streams[key] = inbound
+        window = CreditWindow(credit[0]) if credit is not None else None
+        task = self._track_stream(
+            key,
+            self._run_stream_work(
+                worker_callable,
+                (inbound, *args),
+                kw,
+                routing_id,
+                user_id,
+                message_uuid,
+                codec,
+                window,
+            ),
+            window,
+        )
+        task.add_done_callback(lambda _: self.inbound_streams.pop(key, None))
+        # the caller waits for this credit to send its first items
+        await self._send_credit(
+            routing_id, message_uuid, self.stream_window or MAX_CREDIT
+        )
+
+    async def _run_stream_work(
+        self,
+        worker_callable,
+        args,
+        kw,
+        routing_id,
+        user_id,
+        message_uuid,
+        codec=b'',
+        window=None,
+    ):
+        try:
+            result = await self._call_worker(worker_callable, args, kw, user_id)
+            result = await self._finish_result(result, user_id, gather=False)
+            if inspect.isasyncgen(result) or inspect.isgenerator(result):
+                # bidirectional stream
+                return await self._send_stream(
+                    routing_id, message_uuid, result, codec, window
                 )
+            response = await self._dumps_async(result, codec)
+            status = OK + codec
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self._log_job_failure()
+            response = self._encode_error(exc)
+            status = ERROR
+        await self._send_reply(routing_id, message_uuid, status, response)
+
+    async def _handle_inbound(
+        self, message_type, frames, routing_id, message_uuid, codec
+    ):
+        inbound = self.inbound_streams[(routing_id, message_uuid)]
+        if message_type == STREAM_END:
+            return inbound.end()
+        value = await self._loads_async(frames, codec)
+        if message_type == STREAM_ITEM:
+            inbound.put_item(value)
+        else:
+            # the iterable of the caller raised
+            inbound.set_exception(self._build_exception(value))
 
+    async def _handle_notification(self, frames, user_id, codec=b'', version=VERSION):
+        try:
+            worker_callable, args, kw = await self._unpack_work(
+                frames, user_id, codec, version
+            )
+            result = await self._call_worker(worker_callable, args, kw, user_id)
+            # items of a stream are produced, but dropped
+            if inspect.isasyncgen(result):
+                async for _ in result:
+                    pass
+            elif inspect.isgenerator(result):
+                for _ in result:
+                    pass
         except Exception:
-            logger.exception('Pseud job failed')
-            exc_type, exc_value = sys.exc_info()[:2]
-            traceback_ = traceback.format_exc()
-            name = exc_type.__name__
-            message = str(exc_value)
-            result = (name, message, traceback_)
-            status = ERROR
+            self._log_job_failure()
+
+    async def _handle_work_batch(
+        self, frames, routing_id, user_id, message_uuid, codec=b''
+    ):
+        try:
+            ordered, calls = await self._loads_async(frames, codec)
+            if not isinstance(calls, (list, tuple)):
+                raise TypeError(f'Invalid batch of calls {calls!r}')
+        except Exception as exc:
+            self._log_job_failure()
+            return await self._send_reply(
+                routing_id, message_uuid, ERROR, self._encode_error(exc), user_id
+            )
+        if ordered:
+            results = [await self._run_batched_call(call, user_id) for call in calls]
         else:
-            status = OK
-        response = self.packer.packb(result)
-        message = [routing_id, EMPTY_DELIMITER, VERSION, message_uuid, status, response]
+            results = await asyncio.gather(
+                *(self._run_batched_call(call, user_id) for call in calls)
+            )
+        try:
+            # results are (success, result)
+            response = await self._dumps_async(results, codec, envelope=2)
+        except Exception:
+            # only the results which can not be encoded fail
+            response = self._dumps(
+                [self._encodable_result(result, codec) for result in results], codec
+            )
+        await self._send_reply(routing_id, message_uuid, OK + codec, response, user_id)
+
+    async def _run_batched_call(self, call, user_id):
+        try:
+            locator, args, *kw = call
+            worker_callable = self._resolve_worker_callable(locator, user_id)
+            if worker_callable.raw:
+                raise TypeError(f'{locator!r} can not be batched')
+            result = await self._call_worker(
+                worker_callable, args, kw[0] if kw else {}, user_id
+            )
+            # streams are gathered, like calls awaited as a whole
+            result = await self._finish_result(result, user_id)
+        except Exception as exc:
+            self._log_job_failure()
+            return (False, self._format_error(exc))
+        return (True, result)
+
+    def _encodable_result(self, result, codec=b''):
+        try:
+            self._dumps(result, codec)
+        except Exception as exc:
+            return (False, self._format_error(exc, with_args=False))
+        return result
+
+    def _start_stream(self, routing_id, message_uuid, items, codec=b'', window=None):
+        """
+        Items are sent by a task, so the reader is not blocked
+        for the lifetime of the stream.
+        Without ``window`` the receiver did not ask for flow control.
+        """
+        return self._track_stream(
+            (routing_id, message_uuid),
+            self._send_stream(routing_id, message_uuid, items, codec, window),
+            window,
+        )
+
+    def _track_stream(self, key, coroutine, window=None):
+        task = self.loop.create_task(coroutine)
+        task.add_done_callback(lambda _: self.stream_tasks.pop(key, None))
+        task.add_done_callback(lambda _: self.stream_windows.pop(key, None))
+        task.add_done_callback(handle_result)
+        self.stream_tasks[key] = task
+        if window is not None:
+            self.stream_windows[key] = window
+        return task
+
+    async def _send_stream(
+        self, routing_id, message_uuid, items, codec=b'', window=None
+    ):
+        try:
+            if hasattr(items, '__aiter__'):
+                async for item in items:
+                    await self._send_stream_item(
+                        routing_id, message_uuid, item, codec, window
+                    )
+            else:
+                for item in items:
+                    await self._send_stream_item(
+                        routing_id, message_uuid, item, codec, window
+                    )
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self._log_job_failure()
+            await self._send_reply(
+                routing_id, message_uuid, ERROR, self._encode_error(exc)
+            )
+        else:
+            await self._send_reply(routing_id, message_uuid, STREAM_END, [b''])
+        finally:
+            if hasattr(items, 'aclose'):
+                await items.aclose()
+            elif hasattr(items, 'close'):
+                items.close()
+
+    async def _send_stream_item(
+        self, routing_id, message_uuid, item, codec=b'', window=None
+    ):
+        if window is not None:
+            # paused until the receiver grants credit
+            await window.acquire()
+        response = await self._dumps_async(item, codec)
+        await self._send_reply(routing_id, message_uuid, STREAM_ITEM + codec, response)
+
+    async def _handle_stream_item(self, frames, message_uuid, codec=b''):
+        value = await self._loads_async(frames, codec)
+        future = self.future_pool.get(message_uuid)
+        if isinstance(future, ResponseStream):
+            future.put_item(value)
+        elif future is not None:
+            # call awaited as a whole, items are gathered
+            self.stream_buffers.setdefault(message_uuid, []).append(value)
+        else:
+            logger.warning(f'Stream item received after timeout for {message_uuid!r}')
+
+    def _handle_stream_end(self, message_uuid):
+        future = self.future_pool.pop(message_uuid, None)
+        items = tuple(self.stream_buffers.pop(message_uuid, ()))
+        if isinstance(future, ResponseStream):
+            future.end()
+        elif future is not None:
+            future.set_result(items)
+
+    def _handle_stream_cancel(self, routing_id, message_uuid):
+        task = self.stream_tasks.pop((routing_id, message_uuid), None)
+        if task is not None:
+            task.cancel()
+
+    def _handle_credit(self, routing_id, message_uuid, message):
+        key = (routing_id, message_uuid)
+        credit = decode_credit(message)
+        window = self.stream_windows.get(key)
+        if window is not None:
+            window.grant(credit)
+            return
+        # initial credit is sent before the work, late credit of a finished
+        # stream expires with it.
+        now = self.loop.time()
+        while self.pending_credits:
+            oldest = next(iter(self.pending_credits))
+            if self.pending_credits[oldest][1] > now:
+                break
+            del self.pending_credits[oldest]
+        previous = self.pending_credits.pop(key, (0, None))[0]
+        self.pending_credits[key] = (previous + credit, now + self.timeout)
+
+    def _reply_cache_key(self, routing_id, user_id, message_uuid):
+        """
+        Replies are kept for the authenticated identity of the caller, so
+        work replayed from another connection is found. Without ZAP the
+        routing id of the socket is used.
+        """
+        return (user_id or routing_id, message_uuid)
+
+    async def _send_reply(self, routing_id, message_uuid, status, response, user_id=b''):
+        message = [routing_id, EMPTY_DELIMITER, VERSION, message_uuid, status, *response]
         if logger.isEnabledFor(logging.DEBUG):
-            logger.debug(f'Worker send reply {message[:-1]!r} {pprint.pformat(result)}')
+            logger.debug(
+                f'Worker send reply {message[:5]!r} '
+                f'{self._format_body(response, status[1:])}'
+            )
+        if self.reply_cache is not None and status[:1] in (OK, ERROR, NOT_MODIFIED):
+            self.reply_cache.set(
+                self._reply_cache_key(routing_id, user_id, message_uuid),
+                message[4:],
+                sum(len(frame) for frame in response),
+                self.reply_cache_window,
+                self.reply_cache.generation,
+            )
+        if self.reply_batch_size is not None and status[:1] in (OK, ERROR):
+            return await self._queue_reply(routing_id, message)
         await self.send_message(message)
 
+    async def _queue_reply(self, routing_id, message):
+        """
+        Replies completed within the same loop iteration, or the window,
+        are sent together.
+        """
+        pending = self.pending_replies.setdefault(routing_id, [])
+        pending.append(message)
+        if len(pending) >= self.reply_batch_size:
+            return await self._flush_replies(routing_id)
+        if routing_id not in self.reply_flushers:
+            self.reply_flushers[routing_id] = self.loop.call_later(
+                self.reply_batch_window, self._schedule_flush, routing_id
+            )
+
+    def _schedule_flush(self, routing_id):
+        task = self.loop.create_task(self._flush_replies(routing_id))
+        task.add_done_callback(handle_result)
+
+    async def _flush_replies(self, routing_id):
+        flusher = self.reply_flushers.pop(routing_id, None)
+        if flusher is not None:
+            flusher.cancel()
+        replies = self.pending_replies.pop(routing_id, [])
+        if len(replies) <= 1:
+            for message in replies:
+                await self.send_message(message)
+            return
+        index = []
+        frames = []
+        for message in replies:
+            body = message[5:]
+            index.append((message[3], message[4], len(body)))
+            frames.extend(body)
+        self.metrics['coalesced_replies'] += len(replies)
+        await self.send_message(
+            [
+                routing_id,
+                EMPTY_DELIMITER,
+                VERSION,
+                EMPTY_DELIMITER,
+                MULTI_REPLY,
+                self.packer.packb(index),
+                *frames,
+            ]
+        )
+
     async def send_work(self, user_id, name, *args, **kw):
         await self.start()
-        message, uid = self._prepare_work(user_id, name, *args, **kw)
+        upload, args = split_upload(args)
+        message = None
+        if upload is None and await self._is_local_peer_ready(user_id, name):
+            send = functools.partial(self._send_local_work, user_id, name, args, kw)
+        else:
+            message, uid = await self._prepare_work(
+                user_id, name, args, kw, WORK if upload is None else STREAM_WORK
+            )
+            if upload is not None:
+                return await self._send_work_message(message, uid, upload)
+            send = functools.partial(self._send_work_message, message, uid)
+        ttl = self.cache_policies.get(name) if self.cache is not None else None
+        if not ttl:
+            result = await self._send_retrying(send, name)
+            if isinstance(result, RemoteHandle):
+                return RemoteProxy(self, user_id, result)
+            return result
+        if message is None:
+            # local calls are cached under the arguments they would be sent with
+            message, _ = await self._prepare_work(user_id, name, args, kw)
+        # packed arguments, codec included
+        key = (name, b''.join(map(bytes, message[4:])))
+        result = self.cache.get(key, _marker)
+        if result is not _marker:
+            return result
+        generation = self.cache.generation
+        result = await self._send_retrying(send, name)
+        self.cache.set(key, result, estimate_size(result), ttl, generation)
+        return result
+
+    async def _is_local_peer_ready(self, user_id, name):
+        if self.local_peer is None or name == WHOAMI_LOCATOR:
+            return False
+        if self.local_user_id is None:
+            # authenticated through the socket first
+            self.local_user_id = await self.send_work(user_id, WHOAMI_LOCATOR)
+        if self.local_peer.auth_backend.is_authenticated(self.local_user_id):
+            return True
+        self.local_user_id = None
+        return False
+
+    async def _send_local_work(self, user_id, name, args, kw):
+        """
+        Calls the rpc-callable of the local peer directly, its predicates
+        apply to the identity authenticated through the socket, and errors
+        are rebuilt as if they were received. Calls are guarded by the
+        circuit breaker of the peer, like the ones sent through the socket.
+        """
+        if self.local_copy:
+            args, kw = deepcopy((args, kw))
+        result = await self._call_guarded(
+            self.auth_backend.get_routing_id(user_id),
+            functools.partial(self._wait_local_peer, name, args, kw),
+        )
+        if isinstance(result, RemoteHandle):
+            return RemoteProxy(self, user_id, result)
+        return deepcopy(result) if self.local_copy else result
+
+    async def _wait_local_peer(self, name, args, kw):
+        self.metrics['local_calls'] += 1
+        try:
+            return await asyncio.wait_for(
+                self._call_local_peer(name, args, kw), self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise
+        except Exception as exc:
+            self.local_peer._log_job_failure()
+            raise self._build_exception(self.local_peer._format_error(exc)) from None
+
+    async def _call_local_peer(self, name, args, kw):
+        peer = self.local_peer
+        user_id = self.local_user_id
+        worker_callable = peer._resolve_worker_callable(name, user_id)
+        if worker_callable.raw:
+            raise TypeError(f'{name!r} must be called with raw.{name}()')
+        result = await peer._call_worker(worker_callable, args, kw, user_id)
+        return await peer._finish_result(result, user_id)
+
+    async def release_ref(self, proxy):
+        """
+        Drop the remote object of given proxy, before its lease expires.
+        """
+        await self.send_work(proxy._user_id, RELEASE_REF_LOCATOR, proxy._handle.ref_id)
+
+    async def send_raw_work(self, user_id, name, buffer):
+        """
+        Send given bytes-like object as-is to a raw rpc-callable,
+        the result is a memoryview over the received frame.
+        """
+        await self.start()
+        routing_id = self.auth_backend.get_routing_id(user_id)
+        uid = uuid.uuid4().bytes
+        message = [
+            routing_id,
+            EMPTY_DELIMITER,
+            VERSION_2,
+            uid,
+            WORK + RawSerializer.code,
+            name.encode('utf-8'),
+            *self._dumps(buffer, RawSerializer.code),
+        ]
+        return await self._send_work_message(message, uid)
+
+    async def stream_work(self, user_id, name, *args, **kw):
+        """
+        Async generator over the items sent by a streaming rpc-callable.
+        The remote stream is cancelled if the iteration stops early.
+        At most ``stream_window`` items are sent ahead of the consumer,
+        credit is granted back every half window consumed.
+        """
+        await self.start()
+        upload, args = split_upload(args)
+        message, uid = await self._prepare_work(
+            user_id, name, args, kw, WORK if upload is None else STREAM_WORK
+        )
+        self.future_pool[uid] = stream = ResponseStream(self.timeout)
+        self.auth_backend.save_last_work(message)
+        window = self.stream_window
+        try:
+            if window is not None:
+                await self._send_credit(message[0], uid, window)
+            if upload is not None:
+                self._start_upload(message, uid, upload)
+            await self.send_message(message)
+            consumed = 0
+            async for item in stream:
+                yield item
+                consumed += 1
+                if (
+                    window is not None
+                    and not stream.closed
+                    and consumed >= max(window // 2, 1)
+                ):
+                    await self._send_credit(message[0], uid, consumed)
+                    consumed = 0
+        finally:
+            self.future_pool.pop(uid, None)
+            self._handle_stream_cancel(message[0], uid)
+            if not stream.done():
+                await self.send_message(
+                    [message[0], EMPTY_DELIMITER, VERSION, uid, STREAM_CANCEL, b'']
+                )
+
+    async def _send_credit(self, routing_id, message_uuid, credit):
+        await self.send_message(
+            [
+                routing_id,
+                EMPTY_DELIMITER,
+                VERSION,
+                message_uuid,
+                CREDIT,
+                encode_credit(credit),
+            ]
+        )
+
+    async def send_notification(self, user_id, name, *args, **kw):
+        await self.start()
+        message, _ = await self._prepare_work(user_id, name, args, kw, NOTIFY)
+        await self.send_message(message)
+
+    async def send_multicast(self, user_ids, name, args, kw, timeout=None, reply=True):
+        """
+        Arguments are encoded once per codec, the same frames
+        are sent to every peer. ``timeout`` is the overall deadline.
+        """
+        await self.start()
+        timeout = self.timeout if timeout is None else timeout
+        work_type = WORK if reply else NOTIFY
+        locator, *arguments = self._compile_work(name, args, kw)
+        locator = zmq.Frame(locator.encode('utf-8'))
+        bodies = {}
+        futures = {}
+        results = {}
+        # user_id -> (routing_id, breaker, state) of calls sent through a breaker
+        circuits = {}
+        for user_id in user_ids:
+            try:
+                routing_id = self.auth_backend.get_routing_id(user_id)
+                breaker = self._get_circuit_breaker(routing_id) if reply else None
+                if breaker is not None:
+                    state = self._allow_call(routing_id, breaker)
+                    circuits[user_id] = (routing_id, breaker, state)
+                codec = self.peer_codecs.get(routing_id, self.codec)
+                if codec not in bodies:
+                    work = await self._dumps_async(tuple(arguments), codec, envelope=2)
+                    bodies[codec] = [zmq.Frame(frame) for frame in work]
+            except Exception as exc:
+                results[user_id] = exc
+                continue
+            uid = uuid.uuid4().bytes
+            if reply:
+                self.future_pool[uid] = future = self.loop.create_future()
+                future.add_done_callback(functools.partial(self.cleanup_future, uid))
+                futures[user_id] = future
+            await self.send_message(
+                [
+                    routing_id,
+                    EMPTY_DELIMITER,
+                    VERSION_2,
+                    uid,
+                    work_type + codec,
+                    locator,
+                    *bodies[codec],
+                ]
+            )
+        if not reply:
+            return None
+        if futures:
+            await asyncio.wait(futures.values(), timeout=timeout)
+        for user_id, future in futures.items():
+            if not future.done():
+                future.cancel()
+                results[user_id] = asyncio.TimeoutError()
+            elif future.exception() is not None:
+                results[user_id] = future.exception()
+            else:
+                results[user_id] = future.result()
+        for user_id, (routing_id, breaker, state) in circuits.items():
+            result = results.get(user_id)
+            failed = (
+                isinstance(result, breaker.failure_on) if user_id in futures else None
+            )
+            self._record_call(routing_id, breaker, state, failed)
+        return results
+
+    async def invalidate(self, prefix='', user_ids=None):
+        """
+        Tell peers, all of them which sent work by default, to drop
+        the cached results of rpc-callables whose name starts with prefix.
+        """
+        await self.start()
+        if user_ids is None:
+            routing_ids = list(self.peer_codecs)
+        else:
+            routing_ids = [self.auth_backend.get_routing_id(u) for u in user_ids]
+        body = zmq.Frame(self.packer.packb(prefix))
+        for routing_id in routing_ids:
+            await self.send_message(
+                [routing_id, EMPTY_DELIMITER, VERSION, EMPTY_DELIMITER, INVALIDATE, body]
+            )
+
+    async def send_conditional_work(self, user_id, name, *args, **kw):
+        await self.start()
+        # the version tag follows the locator, only sent with the v2 layout
+        message, uid = await self._prepare_work(
+            user_id, name, args, kw, CONDITIONAL_WORK, VERSION_2
+        )
+        key = (name, b''.join(map(bytes, message[4:])))
+        # kept aside, the entry may be evicted before the reply
+        known = self.versioned_results.get(key)
+        message.insert(6, known.tag if known is not None else b'')
+        self.conditional_calls[uid] = (key, known)
+        return await self._send_work_message(message, uid)
+
+    async def send_work_retrying(self, user_id, name, args, kw, policy):
+        await self.start()
+        message, uid = await self._prepare_work(user_id, name, args, kw)
+        return await policy.run(
+            functools.partial(self._send_work_message, message, uid),
+            self.metrics,
+            name,
+            self.retry_budget,
+        )
+
+    async def _send_retrying(self, send, name):
+        """
+        Awaits ``send()``, retried only for idempotent rpc-callables.
+        Retries of work sent through the socket keep the same uuid.
+        """
+        policy = self.retry_policies.get(name, self.retry_policy)
+        if policy is None or name not in self.idempotent_routes:
+            return await send()
+        return await policy.run(send, self.metrics, name, self.retry_budget)
+
+    async def send_durable_work(self, user_id, name, *args, **kw):
+        if self.durable_log is None:
+            raise RuntimeError('durable_log is not configured')
+        await self.start()
+        message, uid = await self._prepare_work(user_id, name, args, kw)
+        await self.durable_log.append(uid, message)
+        return await self._send_durable_message(message, uid)
+
+    async def _send_durable_message(self, message, uid):
+        """
+        Work is kept in the log until the peer replied, with a result
+        or an error, it is sent again by the next run otherwise.
+        """
+        try:
+            result = await self._send_work_message(message, uid)
+        except (asyncio.TimeoutError, CircuitOpenError):
+            raise
+        except Exception:
+            self.durable_log.discard(uid)
+            raise
+        self.durable_log.discard(uid)
+        return result
+
+    async def _replay_durable_work(self):
+        pending = await self.durable_log.pending()
+        if pending:
+            logger.info(f'Sending again {len(pending)} durable works')
+        self.metrics['durable_replays'] += len(pending)
+        results = await asyncio.gather(
+            *(self._send_durable_message(message, uid) for uid, message in pending),
+            return_exceptions=True,
+        )
+        for (uid, _), result in zip(pending, results):
+            if isinstance(result, Exception):
+                logger.warning(f'Durable work {uid.hex()} failed: {result!r}')
+
+    async def send_batch(self, user_id, calls, ordered=True):
+        await self.start()
+        routing_id = self.auth_backend.get_routing_id(user_id)
+        codec = self.peer_codecs.get(routing_id, self.codec)
+        # calls are (locator, args, kw)
+        work = await self._dumps_async((ordered, calls), codec, envelope=4)
+        uid = uuid.uuid4().bytes
+        message = [
+            routing_id,
+            EMPTY_DELIMITER,
+            VERSION,
+            uid,
+            WORK_BATCH + codec,
+            *work,
+        ]
+        return await self._send_work_message(message, uid)
+
+    def _start_upload(self, message, uid, upload):
+        """
+        Items of the caller are streamed once the peer grants credit.
+        """
+        self._start_stream(message[0], uid, upload, message[4][1:], CreditWindow())
+
+    async def _send_work_message(self, message, uid, upload=None):
+        return await self._call_guarded(
+            message[0],
+            functools.partial(self._send_work_message_windowed, message, uid, upload),
+        )
+
+    async def _call_guarded(self, routing_id, send):
+        """
+        Awaits ``send()`` through the circuit breaker of given peer.
+        """
+        breaker = self._get_circuit_breaker(routing_id)
+        if breaker is None:
+            return await send()
+        state = self._allow_call(routing_id, breaker)
+        failed = None
+        try:
+            result = await send()
+        except breaker.failure_on:
+            failed = True
+            raise
+        except Exception:
+            # the peer is answering
+            failed = False
+            raise
+        else:
+            failed = False
+            return result
+        finally:
+            self._record_call(routing_id, breaker, state, failed)
+
+    def _get_circuit_breaker(self, routing_id):
+        if self.circuit_breaker is None:
+            return None
+        breaker = self.circuit_breakers.get(routing_id)
+        if breaker is None:
+            breaker = self.circuit_breakers[routing_id] = self.circuit_breaker()
+        return breaker
+
+    def _allow_call(self, routing_id, breaker):
+        """
+        Returns the state of the circuit the call is sent in,
+        raises :py:class:`CircuitOpenError` when it must fail fast.
+        """
+        previous = breaker.state
+        state = breaker.allow()
+        self._count_transition(routing_id, previous, breaker.state)
+        if state is None:
+            self.metrics['circuit_rejected'] += 1
+            raise CircuitOpenError(routing_id)
+        return state
+
+    def _record_call(self, routing_id, breaker, state, failed):
+        previous = breaker.state
+        self._count_transition(routing_id, previous, breaker.record(state, failed))
+
+    def _count_transition(self, routing_id, previous, state):
+        if previous == state:
+            return
+        self.metrics[f'circuit_{state}'] += 1
+        self.metrics['open_circuits'] = sum(
+            breaker.state != CLOSED for breaker in self.circuit_breakers.values()
+        )
+        logger.info(f'Circuit of {routing_id!r} is {state}')
+
+    async def _send_work_message_windowed(self, message, uid, upload=None):
+        if self.push_window is None:
+            return await self._send_work_message_unbounded(message, uid, upload)
+        routing_id = message[0]
+        semaphore = self.push_credits.get(routing_id)
+        if semaphore is None:
+            semaphore = self.push_credits[routing_id] = asyncio.Semaphore(
+                self.push_window
+            )
+        # a reply, or its timeout, gives the credit back
+        async with semaphore:
+            return await self._send_work_message_unbounded(message, uid, upload)
+
+    async def _send_work_message_unbounded(self, message, uid, upload=None):
         self.future_pool[uid] = future = self.loop.create_future()
         future.add_done_callback(functools.partial(self.cleanup_future, uid))
+        if upload is not None:
+            self._start_upload(message, uid, upload)
+            # nothing left to stream once the reply is received
+            future.add_done_callback(
+                lambda _: self._handle_stream_cancel(message[0], uid)
+            )
         asyncio.ensure_future(future, loop=self.loop)
-        self.create_timeout_detector(uid)
+        # retries reuse the uuid, the timer must not outlive this attempt
+        timer = self.create_timeout_detector(uid)
+        future.add_done_callback(lambda _: timer.cancel())
         if logger.isEnabledFor(logging.DEBUG):
             logger.debug(
                 'Sending work: {!r} {}'.format(
-                    message[:-1], pprint.pformat(self.packer.unpackb(message[-1]))
+                    message[:6], self._format_body(message[6:], message[4][1:])
                 )
             )
         self.auth_backend.save_last_work(message)
@@ -406,8 +2073,11 @@ class BaseRPC:
         return await future
 
     async def send_message(self, message):
+        if self.shared_memory is not None and self.colocated:
+            message = self.shared_memory.encode(message)
         try:
-            await self.socket.send_multipart(message)
+            # large frames are not copied, small ones are anyway
+            await self.socket.send_multipart(message, copy=False)
         except zmq.error.ZMQError as exc:
             if exc.errno == zmq.EHOSTUNREACH:
                 # ROUTER does not know yet the recipient
@@ -424,8 +2094,27 @@ class BaseRPC:
                 read_forever(self.socket, self.on_socket_ready)
             )
             self.reader.add_done_callback(handle_result)
+        if self.loop_lag_interval is not None and self.loop_lag_monitor is None:
+            self.loop_lag_monitor = self.loop.create_task(self._monitor_loop_lag())
+            self.loop_lag_monitor.add_done_callback(handle_result)
+        if self.durable_log is not None and self.durable_replays is None:
+            self.durable_replays = self.loop.create_task(self._replay_durable_work())
+            self.durable_replays.add_done_callback(handle_result)
+        self.remote_refs.start(self.loop)
         self.counter = Counter()
 
+    async def _monitor_loop_lag(self):
+        """
+        Measures how late the loop wakes up this task,
+        a busy loop delays every peer by as much.
+        """
+        while True:
+            start = self.loop.time()
+            await asyncio.sleep(self.loop_lag_interval)
+            lag = max(self.loop.time() - start - self.loop_lag_interval, 0)
+            self.metrics['loop_lag'] = lag
+            self.metrics['loop_lag_max'] = max(self.metrics['loop_lag_max'], lag)
+
     def timeout_task(self, uuid):
         try:
             self.future_pool[uuid].set_exception(asyncio.TimeoutError())
@@ -438,6 +2127,29 @@ class BaseRPC:
             with contextlib.suppress(asyncio.CancelledError):
                 await self.reader
             self.reader = None
+        if self.loop_lag_monitor is not None:
+            self.loop_lag_monitor.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.loop_lag_monitor
+            self.loop_lag_monitor = None
+        for task in list(self.stream_tasks.values()):
+            task.cancel()
+        for task in list(self.memo_inflight.values()):
+            task.cancel()
+        self.remote_refs.clear()
+        for endpoint, rpc in list(_local_rpcs.items()):
+            if rpc is self:
+                del _local_rpcs[endpoint]
+        if self.shared_memory is not None:
+            self.shared_memory.close()
+        for routing_id in list(self.pending_replies):
+            await self._flush_replies(routing_id)
+        if self.durable_log is not None:
+            if self.durable_replays is not None:
+                self.durable_replays.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await self.durable_replays
+            await self.durable_log.close()
         if not self.socket.closed:
             self.socket.close(linger=0)
         await asyncio.gather(
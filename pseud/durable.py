@@ -0,0 +1,121 @@
+import asyncio
+import concurrent.futures
+import logging
+import sqlite3
+
+import msgpack
+
+logger = logging.getLogger(__name__)
+
+
+class DurableLog:
+    """
+    Write-ahead log of the work sent in durable mode, kept in a sqlite
+    database in WAL mode. Work is appended before being sent, and removed
+    once its peer replied. Writes of the last ``flush_interval`` seconds are
+    committed together, so one fsync is shared by many calls.
+    """
+
+    def __init__(self, path, flush_interval=0.002):
+        self.path = path
+        self.flush_interval = flush_interval
+        # the connection is only used from this thread
+        self.executor = concurrent.futures.ThreadPoolExecutor(1)
+        self.connection = self.executor.submit(self._connect).result()
+        # (uid, encoded message, future resolved once committed)
+        self.appends = []
+        self.discards = []
+        self.flusher = None
+        self.closed = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=FULL')
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS outbox (uid BLOB PRIMARY KEY, message BLOB)'
+        )
+        return connection
+
+    async def append(self, uid, message):
+        """
+        Returns once given message is committed.
+        """
+        if self.closed:
+            raise RuntimeError('Durable log is closed')
+        future = asyncio.get_running_loop().create_future()
+        self.appends.append((uid, msgpack.packb([bytes(f) for f in message]), future))
+        self._schedule()
+        await future
+
+    def discard(self, uid):
+        if self.closed:
+            # replied after the rpc stopped, sent again by the next run
+            return
+        self.discards.append(uid)
+        self._schedule()
+
+    async def pending(self):
+        """
+        Returns the ``(uid, message)`` not acknowledged yet, in order.
+        """
+        rows = await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            lambda: self.connection.execute(
+                'SELECT uid, message FROM outbox ORDER BY rowid'
+            ).fetchall(),
+        )
+        return [(uid, msgpack.unpackb(message)) for uid, message in rows]
+
+    def _schedule(self):
+        if self.flusher is None:
+            self.flusher = asyncio.ensure_future(self._flush())
+
+    async def _flush(self):
+        try:
+            await asyncio.sleep(self.flush_interval)
+            while self.appends or self.discards:
+                appends, self.appends = self.appends, []
+                discards, self.discards = self.discards, []
+                try:
+                    await asyncio.get_running_loop().run_in_executor(
+                        self.executor, self._write, appends, discards
+                    )
+                except Exception as exc:
+                    logger.exception('Durable log write failed')
+                    for *_, future in appends:
+                        if not future.done():
+                            future.set_exception(exc)
+                else:
+                    for *_, future in appends:
+                        if not future.done():
+                            future.set_result(None)
+        finally:
+            self.flusher = None
+
+    def _write(self, appends, discards):
+        self.connection.execute('BEGIN')
+        try:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO outbox (uid, message) VALUES (?, ?)',
+                [(uid, message) for uid, message, _ in appends],
+            )
+            self.connection.executemany(
+                'DELETE FROM outbox WHERE uid = ?', [(uid,) for uid in discards]
+            )
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+
+    async def close(self):
+        self.closed = True
+        if self.flusher is not None:
+            await self.flusher
+        await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.connection.close
+        )
+        self.executor.shutdown()
+
+
+__all__ = ('DurableLog',)
@@ -1,14 +1,43 @@
 import zope.interface
 
 AUTHENTICATED = b'\x04'
+# WORK carrying the version tag of the result known by the caller
+CONDITIONAL_WORK = b'\x05'
+CREDIT = b'\x0a'
 ERROR = b'\x10'
 HEARTBEAT = b'\x06'
 HELLO = b'\x02'
+# results of rpc-callables cached by the peer are stale
+INVALIDATE = b'\x0f'
+# replies to the same peer coalesced in one message
+MULTI_REPLY = b'\x0d'
+# result of a CONDITIONAL_WORK did not change
+NOT_MODIFIED = b'\x12'
+# WORK without reply
+NOTIFY = b'\x0e'
 OK = b'\x01'
+STREAM_CANCEL = b'\x09'
+STREAM_END = b'\x08'
+STREAM_ITEM = b'\x07'
+# WORK whose first argument is streamed by the caller
+STREAM_WORK = b'\x0b'
 UNAUTHORIZED = b'\x11'
 WORK = b'\x03'
+# many WORK in one message, answered with a single OK
+WORK_BATCH = b'\x0c'
 
 VERSION = b'v1'
+# WORK messages with the locator in its own frame
+VERSION_2 = b'v2'
+
+SCHEMA_LOCATOR = 'pseud.schema'
+CACHE_POLICIES_LOCATOR = 'pseud.cache_policies'
+IDEMPOTENT_ROUTES_LOCATOR = 'pseud.idempotent_routes'
+# methods of remote objects are called as ``pseud.ref.<ref_id>.<method>``
+REMOTE_REF_PREFIX = 'pseud.ref.'
+RELEASE_REF_LOCATOR = 'pseud.release_ref'
+# identity of the caller, as authenticated by the peer
+WHOAMI_LOCATOR = 'pseud.whoami'
 
 EMPTY_DELIMITER = b''
 
@@ -21,6 +50,16 @@ class UnauthorizedError(Exception):
     pass
 
 
+class UnsupportedSerializerError(Exception):
+    pass
+
+
+class CircuitOpenError(Exception):
+    """
+    Calls to this peer fail fast, until its circuit breaker lets probes through
+    """
+
+
 class IAuthenticationBackend(zope.interface.Interface):
     rpc = zope.interface.Attribute(
         """
@@ -151,6 +190,11 @@ class IBaseRPC(zope.interface.Interface):
         Max allowed time to send, recv or to wait for a task.
         """
     )
+    serializer = zope.interface.Attribute(
+        """
+        Name of the serializer plugin used to encode outgoing messages
+        """
+    )
 
     def connect(endpoint):
         """
@@ -176,6 +220,61 @@ class IBaseRPC(zope.interface.Interface):
             Keyword arguments of the rpc-callable
         """
 
+    def stream_work(user_id, name, *args, **kw):
+        """
+        Same as :py:meth:`send_work`, but returns an async iterator
+        over the items sent by a streaming rpc-callable.
+        """
+
+    def send_notification(user_id, name, *args, **kw):
+        """
+        Same as :py:meth:`send_work`, but the peer sends no reply
+        and nothing is awaited beyond the sending of the message.
+        """
+
+    def send_multicast(user_ids, name, args, kw, timeout=None, reply=True):
+        """
+        Send the same work to many peers, arguments are encoded once.
+        Returns a dict of user_id -> result or exception, or ``None``
+        without ``reply``.
+        """
+
+    def send_conditional_work(user_id, name, *args, **kw):
+        """
+        Same as :py:meth:`send_work`, but the result is only sent
+        by the peer if it changed since the previous identical call.
+        """
+
+    def send_durable_work(user_id, name, *args, **kw):
+        """
+        Same as :py:meth:`send_work`, but the work is written to the durable
+        log first, and sent again on restart until the peer replied.
+        """
+
+    def release_ref(proxy):
+        """
+        Drop the object referenced by given :py:class:`pseud.remote.RemoteProxy`
+        on the peer.
+        """
+
+    def retrying(policy=3):
+        """
+        Calls made on the returned object are sent again with the same
+        uuid when they time out, following given
+        :py:class:`pseud.retry.RetryPolicy` or number of attempts.
+        """
+
+    def send_batch(user_id, calls, ordered=True):
+        """
+        Send many compiled calls in one message, returns
+        a list of ``(succeeded, result or error)``.
+        """
+
+    def batch(ordered=True, user_id=None):
+        """
+        Async context manager collecting calls, sent together at exit.
+        """
+
     def create_timeout_detector(uuid):
         """
         Run in background a timeout task to terminate
@@ -237,6 +336,12 @@ class IClient(IBaseRPC):
         """
     )
 
+    def fetch_schema():
+        """
+        Retrieve schema of rpc-callables exposed by the peer,
+        so keyword arguments are sent positionally.
+        """
+
 
 class IServer(IBaseRPC):
     """
@@ -277,6 +382,41 @@ class IHeartbeatBackend(zope.interface.Interface):
         """
 
 
+class ISerializer(zope.interface.Interface):
+    """
+    Interface for serializer backend
+    """
+
+    rpc = zope.interface.Attribute(
+        """
+        RPC instance
+        """
+    )
+    name = zope.interface.Attribute(
+        """
+        Name of the plugin, used to select it from the RPC instance
+        """
+    )
+    code = zope.interface.Attribute(
+        """
+        Header byte appended to the message type frame
+        to tell the peer which serializer encoded the body.
+        Empty for the default serializer.
+        """
+    )
+
+    def dumps(obj):
+        """
+        Must return a list of frames encoding given object
+        """
+
+    def loads(frames):
+        """
+        Must rebuild the object from the list of frames
+        produced by :py:meth:`dumps`
+        """
+
+
 class IRPCCallable(zope.interface.Interface):
     """
     Wrapper around callable.
@@ -299,6 +439,33 @@ class IRPCCallable(zope.interface.Interface):
         Name of Predicate domain
         """
     )
+    schema = zope.interface.Attribute(
+        """
+        Tuple of parameter names that peers can send positionally
+        """
+    )
+    raw = zope.interface.Attribute(
+        """
+        If True, the callable receives a memoryview over the incoming
+        frame and returns bytes-like object sent as-is.
+        """
+    )
+    cacheable = zope.interface.Attribute(
+        """
+        Number of seconds peers may cache results, or None
+        """
+    )
+    memoize = zope.interface.Attribute(
+        """
+        Number of seconds encoded results are reused for identical
+        calls, or None
+        """
+    )
+    idempotent = zope.interface.Attribute(
+        """
+        Whether peers may send the same call again when it failed
+        """
+    )
 
     def __call__(*args, **kw):
         """
@@ -319,6 +486,12 @@ class IRPCRoute(zope.interface.Interface):
     """
 
 
+class IRemoteException(zope.interface.Interface):
+    """
+    Just an identifier for exception classes rebuilt from remote errors
+    """
+
+
 class IPredicate(zope.interface.Interface):
     """
     Responsible to allow or discard execution of
@@ -29,10 +29,13 @@ THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
+import dataclasses
 import datetime
+import enum
 import functools
 import itertools
 import logging
+import operator
 import pickle
 
 import msgpack
@@ -46,24 +49,74 @@ _default = {
     for i, cls in enumerate(_datetime_objs, start=123)
 }
 NOT_SET = object()
+# Types msgpack serializes natively, their subclasses are given to
+# ext_type_pack_hook once strict types are enabled.
+_native_types = (bool, int, float, str, bytes, bytearray, list, tuple, dict)
+
+
+def _make_fields_getter(names):
+    if not names:
+        return lambda obj: ()
+    if len(names) == 1:
+        getter = operator.attrgetter(names[0])
+        return lambda obj: (getter(obj),)
+    return operator.attrgetter(*names)
+
+
+def _compile_dataclass(cls):
+    fields = dataclasses.fields(cls)
+    names = tuple(field.name for field in fields)
+    getter = _make_fields_getter(names)
+    if all(field.init and not getattr(field, 'kw_only', False) for field in fields):
+
+        def unpacker(values):
+            return cls(*values)
+
+    else:
+        init_names = {field.name for field in fields if field.init}
+
+        def unpacker(values):
+            values = dict(zip(names, values))
+            obj = cls(**{name: values.pop(name) for name in init_names})
+            for name, value in values.items():
+                # bypass frozen dataclasses
+                object.__setattr__(obj, name, value)
+            return obj
+
+    return getter, unpacker
+
+
+def _compile_namedtuple(cls):
+    return tuple, cls._make
+
+
+def _compile_enum(cls):
+    return operator.attrgetter('_value_'), cls
 
 
 class Packer:
     def __init__(self, translation_table=None):
         if translation_table is None:
-            translation_table = _default
+            translation_table = dict(_default)
         else:
             translation_table = dict(
                 itertools.chain(_default.items(), translation_table.items())
             )
         self.translation_table = translation_table
         self._pack_cache = {}
+        self._strict_types = False
+
+    def _packb(self, data):
+        return msgpack.packb(
+            data,
+            use_bin_type=True,
+            default=self.ext_type_pack_hook,
+            strict_types=self._strict_types,
+        )
 
     def packb(self, data):
         try:
-            return msgpack.packb(
-                data, use_bin_type=True, default=self.ext_type_pack_hook
-            )
+            return self._packb(data)
         except Exception:
             logger.exception('Packing failed')
             raise
@@ -94,11 +147,20 @@ class Packer:
                     self._pack_cache[obj_class] = (code, packer)
                     return msgpack.ExtType(code, packer(obj))
             else:
+                if self._strict_types:
+                    for native_type in _native_types:
+                        if isinstance(obj, native_type):
+                            # pack it as msgpack does without strict types
+                            native = list if native_type is tuple else native_type
+                            self._pack_cache[obj_class] = (None, native)
+                            return native(obj)
                 self._pack_cache[obj_class] = None
                 raise TypeError(f"Unknown type: {obj!r}")
         else:
             # do shortcut
             code, packer = hit
+            if code is None:
+                return packer(obj)
             return msgpack.ExtType(code, packer(obj))
 
     def ext_type_unpack_hook(self, code, data):
@@ -115,3 +177,41 @@ class Packer:
             )
         self.translation_table[code] = (base_class, packer, unpacker)
         self._pack_cache.pop(base_class, None)
+
+    def register_type(self, code, cls, strict_types=False):
+        """
+        Register an ext handler for dataclasses, :py:class:`typing.NamedTuple`
+        and :py:class:`enum.Enum` subclasses.
+        Values are packed in order of fields, then the exact same type
+        is rebuilt by the peer, which must register it under the same code.
+
+        Subclasses of types msgpack packs natively, like NamedTuples or
+        IntEnums, require ``strict_types``: from then on, every tuple packed
+        by this packer goes through a python hook, which is much slower.
+        """
+        if dataclasses.is_dataclass(cls):
+            getter, unpacker = _compile_dataclass(cls)
+        elif issubclass(cls, tuple) and hasattr(cls, '_fields'):
+            getter, unpacker = _compile_namedtuple(cls)
+        elif issubclass(cls, enum.Enum):
+            getter, unpacker = _compile_enum(cls)
+        else:
+            raise TypeError(f'Can not generate ext handler for {cls!r}')
+        if issubclass(cls, _native_types):
+            # msgpack would pack them natively, e.g. NamedTuple as list
+            if not strict_types:
+                raise TypeError(
+                    f'{cls!r} is packed natively by msgpack, register it with'
+                    ' strict_types=True, at the cost of slower packing of tuples'
+                )
+            self._strict_types = True
+            self._pack_cache[tuple] = (None, list)
+
+        def packer(obj):
+            return self._packb(getter(obj))
+
+        def _unpacker(data):
+            return unpacker(self.unpackb(data))
+
+        self.register_ext_handler(code, cls, packer, _unpacker)
+        return cls
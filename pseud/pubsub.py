@@ -0,0 +1,188 @@
+import asyncio
+import contextlib
+import logging
+
+import zmq
+
+from .common import handle_result, read_forever
+
+logger = logging.getLogger(__name__)
+
+# socket options configured by authentication backends, per mechanism
+SECURITY_OPTIONS = {
+    zmq.PLAIN: (zmq.PLAIN_SERVER, zmq.PLAIN_USERNAME, zmq.PLAIN_PASSWORD),
+    zmq.CURVE: (
+        zmq.CURVE_SERVER,
+        zmq.CURVE_PUBLICKEY,
+        zmq.CURVE_SECRETKEY,
+        zmq.CURVE_SERVERKEY,
+    ),
+}
+
+
+def copy_security_options(source, target):
+    """
+    Configure ``target`` socket like the RPC socket ``source``,
+    so its peers are authenticated by the same backend.
+    """
+    options = SECURITY_OPTIONS.get(source.getsockopt(zmq.MECHANISM), ())
+    if zmq.CURVE_SERVER in options and source.getsockopt(zmq.CURVE_SERVER):
+        # setting a server key would turn the socket into a client
+        options = options[:-1]
+    for option in (*options, zmq.ZAP_DOMAIN):
+        value = source.getsockopt(option)
+        if value:
+            target.setsockopt(option, value)
+
+
+def _encode_topic(topic):
+    return topic.encode('utf-8') if isinstance(topic, str) else topic
+
+
+class Publisher:
+    """
+    XPUB socket of a Server. Topics are filtered by prefix within libzmq,
+    and nothing is encoded for a topic nobody subscribed to.
+
+    Messages are ``[topic, codec, *body]``.
+    """
+
+    def __init__(self, rpc):
+        self.rpc = rpc
+        self.socket = None
+        self.reader = None
+        # prefixes subscribed by at least one peer
+        self.topics = set()
+
+    def bind(self, endpoint):
+        if self.socket is None:
+            if not self.rpc.initialized:
+                raise RuntimeError('You must connect or bind first')
+            self.socket = self.rpc.context.socket(zmq.XPUB)
+            copy_security_options(self.rpc.socket, self.socket)
+        self.socket.bind(endpoint)
+
+    def has_subscribers(self, topic):
+        return any(topic.startswith(prefix) for prefix in self.topics)
+
+    async def publish(self, topic, value):
+        topic = _encode_topic(topic)
+        if not self.has_subscribers(topic):
+            return False
+        codec = self.rpc.codec
+        body = await self.rpc._dumps_async(value, codec)
+        await self.socket.send_multipart([topic, codec, *body], copy=False)
+        self.rpc.metrics['publications'] += 1
+        return True
+
+    async def _on_subscription(self, message):
+        frame = bytes(message[0])
+        if frame[:1] == b'\x01':
+            self.topics.add(frame[1:])
+        elif frame[:1] == b'\x00':
+            self.topics.discard(frame[1:])
+
+    async def start(self):
+        if self.socket is not None and self.reader is None:
+            self.reader = self.rpc.loop.create_task(
+                read_forever(self.socket, self._on_subscription)
+            )
+            self.reader.add_done_callback(handle_result)
+
+    async def stop(self):
+        if self.reader is not None:
+            self.reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.reader
+            self.reader = None
+        if self.socket is not None and not self.socket.closed:
+            self.socket.close(linger=0)
+
+
+class Subscription:
+    """
+    Async iterator over the ``(topic, value)`` published under a topic prefix.
+    Publications are dropped when ``maxsize`` of them are not consumed yet.
+    """
+
+    def __init__(self, subscriber, prefix, maxsize=0):
+        self.subscriber = subscriber
+        self.prefix = prefix
+        self.queue = asyncio.Queue(maxsize)
+
+    def put(self, topic, value):
+        try:
+            self.queue.put_nowait((topic, value))
+        except asyncio.QueueFull:
+            self.subscriber.rpc.metrics['dropped_publications'] += 1
+
+    def close(self):
+        self.subscriber.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+
+class Subscriber:
+    """
+    SUB socket of a Client, dispatching publications to subscriptions.
+    """
+
+    def __init__(self, rpc):
+        self.rpc = rpc
+        self.socket = None
+        self.reader = None
+        self.subscriptions = []
+
+    def connect(self, endpoint):
+        if self.socket is None:
+            if not self.rpc.initialized:
+                raise RuntimeError('You must connect or bind first')
+            self.socket = self.rpc.context.socket(zmq.SUB)
+            copy_security_options(self.rpc.socket, self.socket)
+        self.socket.connect(endpoint)
+
+    def subscribe(self, prefix):
+        prefix = _encode_topic(prefix)
+        subscription = Subscription(self, prefix, self.rpc.stream_window or 0)
+        self.subscriptions.append(subscription)
+        self.socket.subscribe(prefix)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+            # libzmq counts subscriptions of the same prefix
+            self.socket.unsubscribe(subscription.prefix)
+
+    async def _on_publication(self, message):
+        topic, codec = bytes(message[0]), bytes(message[1])
+        if codec not in self.rpc.serializers:
+            logger.error(f'Refused publication encoded with codec {codec!r}')
+            return
+        value = await self.rpc._loads_async(message[2:], codec)
+        for subscription in self.subscriptions:
+            if topic.startswith(subscription.prefix):
+                subscription.put(topic, value)
+
+    async def start(self):
+        if self.socket is not None and self.reader is None:
+            self.reader = self.rpc.loop.create_task(
+                read_forever(self.socket, self._on_publication)
+            )
+            self.reader.add_done_callback(handle_result)
+
+    async def stop(self):
+        if self.reader is not None:
+            self.reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self.reader
+            self.reader = None
+        if self.socket is not None and not self.socket.closed:
+            self.socket.close(linger=0)
+
+
+__all__ = ('Publisher', 'Subscriber', 'Subscription')
@@ -0,0 +1,186 @@
+import functools
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from .interfaces import REMOTE_REF_PREFIX, ServiceNotFoundError
+
+logger = logging.getLogger(__name__)
+
+# msgpack ext code of handles
+REMOTE_HANDLE_CODE = 127
+
+
+class RemoteRef:
+    """
+    Returned by an rpc-callable, ``obj`` stays on the server and the caller
+    receives a proxy to call its methods. The reference expires when not
+    used for ``lease`` seconds.
+    """
+
+    def __init__(self, obj, lease=60):
+        self.obj = obj
+        self.lease = lease
+
+
+class RemoteHandle:
+    """
+    What the caller receives instead of the object of a :py:class:`RemoteRef`.
+    """
+
+    __slots__ = ('ref_id',)
+
+    def __init__(self, ref_id):
+        self.ref_id = ref_id
+
+    def __eq__(self, other):
+        return isinstance(other, RemoteHandle) and other.ref_id == self.ref_id
+
+    def __hash__(self):
+        return hash(self.ref_id)
+
+    def __repr__(self):
+        return f'RemoteHandle({self.ref_id!r})'
+
+    def __reduce__(self):
+        return RemoteHandle, (self.ref_id,)
+
+
+class RemoteRefTable:
+    """
+    Objects referenced by peers, only reachable by the peer they were
+    returned to. Every call renews the lease of the reference.
+    Once started, expired references are dropped by a sweep scheduled
+    at the earliest expiration.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        # ref_id -> (ref, owner, expiration)
+        self.entries = OrderedDict()
+        self.loop = None
+        self.sweeper = None
+        self.sweep_at = None
+
+    def start(self, loop):
+        if self.loop is None:
+            self.loop = loop
+            self._schedule_sweep()
+
+    def add(self, ref, owner):
+        self.expire()
+        ref_id = os.urandom(8).hex()
+        expiration = time.monotonic() + ref.lease
+        self.entries[ref_id] = (ref, owner, expiration)
+        self.metrics['remote_refs'] = len(self.entries)
+        self._schedule_sweep(expiration)
+        return RemoteHandle(ref_id)
+
+    def get(self, ref_id, owner):
+        self.expire()
+        entry = self.entries.get(ref_id)
+        if entry is not None and entry[2] <= time.monotonic():
+            del self.entries[ref_id]
+            self.metrics['remote_refs_expired'] += 1
+            self.metrics['remote_refs'] = len(self.entries)
+            entry = None
+        if entry is None or entry[1] != owner:
+            raise ServiceNotFoundError(f'{REMOTE_REF_PREFIX}{ref_id}')
+        ref = entry[0]
+        self.entries[ref_id] = (ref, owner, time.monotonic() + ref.lease)
+        self.entries.move_to_end(ref_id)
+        return ref.obj
+
+    def release(self, ref_id, owner):
+        self.expire()
+        entry = self.entries.get(ref_id)
+        if entry is not None and entry[1] == owner:
+            del self.entries[ref_id]
+            self.metrics['remote_refs'] = len(self.entries)
+
+    def expire(self):
+        """
+        Drop expired references, least recently used first.
+        """
+        now = time.monotonic()
+        while self.entries:
+            ref_id, (_, _, expiration) = next(iter(self.entries.items()))
+            if expiration > now:
+                break
+            del self.entries[ref_id]
+            self.metrics['remote_refs_expired'] += 1
+        self.metrics['remote_refs'] = len(self.entries)
+
+    def sweep(self):
+        """
+        Drop every expired reference, whatever their lease.
+        """
+        self.sweeper = None
+        now = time.monotonic()
+        expired = [
+            ref_id
+            for ref_id, (_, _, expiration) in self.entries.items()
+            if expiration <= now
+        ]
+        for ref_id in expired:
+            del self.entries[ref_id]
+        self.metrics['remote_refs_expired'] += len(expired)
+        self.metrics['remote_refs'] = len(self.entries)
+        self._schedule_sweep()
+
+    def _schedule_sweep(self, expiration=None):
+        if self.loop is None or not self.entries:
+            return
+        if expiration is None:
+            expiration = min(entry[2] for entry in self.entries.values())
+        if self.sweeper is not None:
+            if self.sweep_at <= expiration:
+                return
+            self.sweeper.cancel()
+        self.sweep_at = expiration
+        self.sweeper = self.loop.call_later(
+            max(expiration - time.monotonic(), 0), self.sweep
+        )
+
+    def clear(self):
+        if self.sweeper is not None:
+            self.sweeper.cancel()
+            self.sweeper = None
+        self.loop = None
+        self.entries.clear()
+        self.metrics['remote_refs'] = 0
+
+
+class RemoteProxy:
+    """
+    Calls methods of the object referenced by a :py:class:`RemoteHandle`,
+    ``await proxy.method(*args)``.
+    Released when used as an async context manager.
+    """
+
+    def __init__(self, rpc, user_id, handle):
+        self._rpc = rpc
+        self._user_id = user_id
+        self._handle = handle
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return functools.partial(
+            self._rpc.send_work,
+            self._user_id,
+            f'{REMOTE_REF_PREFIX}{self._handle.ref_id}.{name}',
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self._rpc.release_ref(self)
+
+    def __repr__(self):
+        return f'<RemoteProxy {self._handle.ref_id}>'
+
+
+__all__ = ('RemoteHandle', 'RemoteProxy', 'RemoteRef', 'RemoteRefTable')
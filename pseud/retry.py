@@ -0,0 +1,91 @@
+import asyncio
+import logging
+import random
+
+logger = logging.getLogger(__name__)
+
+
+class RetryBudget:
+    """
+    Bounds retries to a fraction ``ratio`` of the calls sent,
+    on top of a reserve of ``reserve`` retries, so a failing peer
+    is not hammered by every caller at once.
+    """
+
+    def __init__(self, ratio=0.1, reserve=10):
+        self.ratio = ratio
+        self.reserve = reserve
+        self.tokens = reserve
+
+    def deposit(self):
+        self.tokens = min(self.tokens + self.ratio, self.reserve)
+
+    def withdraw(self):
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RetryPolicy:
+    """
+    Retries of calls which timed out, or failed with one of ``retry_on``,
+    up to ``attempts`` attempts in total.
+    Attempt ``n`` waits a random delay up to ``backoff * 2 ** (n - 1)``
+    seconds, capped at ``max_backoff``, so callers do not retry in sync.
+    Without ``budget`` retries are bounded by the budget given to ``run``,
+    shared by all the policies of an rpc.
+    """
+
+    def __init__(
+        self,
+        attempts=3,
+        backoff=0.05,
+        max_backoff=2,
+        retry_on=(asyncio.TimeoutError,),
+        budget=None,
+    ):
+        if attempts < 1:
+            raise ValueError('attempts must be at least 1')
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+        self.budget = budget
+
+    def delay(self, attempt):
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        )
+
+    async def run(self, send, metrics, name, budget=None):
+        """
+        Await ``send()`` until it succeeds, or the policy gives up.
+        """
+        if self.budget is not None:
+            budget = self.budget
+        elif budget is None:
+            budget = RetryBudget()
+        budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                result = await send()
+            except self.retry_on as exc:
+                if attempt == self.attempts:
+                    metrics['retries_exhausted'] += 1
+                    raise
+                if not budget.withdraw():
+                    metrics['retries_over_budget'] += 1
+                    raise
+                metrics['retries'] += 1
+                logger.info(f'Retry {attempt} of {name!r} after {exc!r}')
+                await asyncio.sleep(self.delay(attempt))
+                attempt += 1
+            else:
+                if attempt > 1:
+                    metrics['retries_succeeded'] += 1
+                return result
+
+
+__all__ = ('RetryBudget', 'RetryPolicy')
@@ -0,0 +1,84 @@
+import logging
+import pickle
+
+import zope.component
+import zope.interface
+
+from .interfaces import IBaseRPC, ISerializer
+from .utils import register_serializer
+
+logger = logging.getLogger(__name__)
+
+
+class _BaseSerializer:
+    def __init__(self, rpc):
+        self.rpc = rpc
+
+
+@register_serializer
+@zope.interface.implementer(ISerializer)
+@zope.component.adapter(IBaseRPC)
+class MsgpackSerializer(_BaseSerializer):
+    """
+    Default serializer, relies on the :py:class:`pseud.packer.Packer`
+    of the RPC instance, so its translation table is honoured.
+    """
+
+    name = 'msgpack'
+    code = b''
+
+    def dumps(self, obj):
+        return [self.rpc.packer.packb(obj)]
+
+    def loads(self, frames):
+        return self.rpc.packer.unpackb(frames[0])
+
+
+@register_serializer
+@zope.interface.implementer(ISerializer)
+@zope.component.adapter(IBaseRPC)
+class PickleSerializer(_BaseSerializer):
+    """
+    Pickle protocol 5, large buffers are sent out-of-band
+    as extra frames, to avoid copying them.
+
+    .. warning::
+
+        Unpickling can execute arbitrary code, only enable it
+        between trusted peers.
+    """
+
+    name = 'pickle'
+    code = b'\x01'
+    protocol = 5
+
+    def dumps(self, obj):
+        buffers = []
+        data = pickle.dumps(obj, protocol=self.protocol, buffer_callback=buffers.append)
+        return [data, *(buffer.raw() for buffer in buffers)]
+
+    def loads(self, frames):
+        return pickle.loads(frames[0], buffers=frames[1:])
+
+
+@register_serializer
+@zope.interface.implementer(ISerializer)
+@zope.component.adapter(IBaseRPC)
+class RawSerializer(_BaseSerializer):
+    """
+    Body is sent as-is, only bytes-like objects are supported.
+    """
+
+    name = 'raw'
+    code = b'\x02'
+
+    def dumps(self, obj):
+        if not isinstance(obj, (bytes, bytearray, memoryview)):
+            raise TypeError(f'Raw serializer can not encode {type(obj)!r}')
+        return [obj]
+
+    def loads(self, frames):
+        return memoryview(frames[0])
+
+
+__all__ = ('MsgpackSerializer', 'PickleSerializer', 'RawSerializer')
@@ -5,6 +5,7 @@ import zope.interface
 
 from .common import BaseRPC
 from .interfaces import IServer
+from .pubsub import Publisher
 
 logger = logging.getLogger(__name__)
 
@@ -17,3 +18,25 @@ class Server(BaseRPC):
         if routing_id:
             raise TypeError('routing_id argument is prohibited')
         super().__init__(user_id=user_id, routing_id=user_id, **kw)
+        self.publisher = Publisher(self)
+
+    def bind_publisher(self, endpoint):
+        """
+        Bind the XPUB socket, secured like the RPC socket.
+        """
+        self.publisher.bind(endpoint)
+
+    async def publish(self, topic, value):
+        """
+        Returns ``False`` if no client subscribed to the topic,
+        then nothing is sent.
+        """
+        return await self.publisher.publish(topic, value)
+
+    async def start(self):
+        await super().start()
+        await self.publisher.start()
+
+    async def stop(self):
+        await self.publisher.stop()
+        await super().stop()
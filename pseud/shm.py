@@ -0,0 +1,136 @@
+import collections
+import logging
+import mmap
+import os
+import re
+import time
+import uuid
+
+import msgpack
+
+logger = logging.getLogger(__name__)
+
+# high bit of the codec byte, body frames were moved to shared memory
+SHARED_MEMORY_FLAG = 0x80
+_SEGMENT_NAME = re.compile(r'pseud-[0-9a-f]{32}')
+
+
+def flag_codec(codec):
+    return bytes([(codec[0] if codec else 0) | SHARED_MEMORY_FLAG])
+
+
+def unflag_codec(codec):
+    code = codec[0] & ~SHARED_MEMORY_FLAG
+    return bytes([code]) if code else b''
+
+
+def is_flagged(codec):
+    return bool(codec) and bool(codec[0] & SHARED_MEMORY_FLAG)
+
+
+class SharedMemoryTransport:
+    """
+    Moves body frames bigger than ``threshold`` bytes to shared memory
+    segments in ``directory``, a tmpfs like ``/dev/shm``, between peers
+    on the same host. Only the names of the segments are sent, in a
+    trailing frame.
+
+    The receiver maps segments read-only and unlinks them, they are unmapped
+    once nothing references their content. Segments not received within
+    ``timeout`` seconds are unlinked by the sender.
+    """
+
+    def __init__(self, threshold, metrics, directory='/dev/shm', timeout=30):
+        self.threshold = threshold
+        self.metrics = metrics
+        self.directory = directory
+        self.timeout = timeout
+        # path -> expiration of segments sent
+        self.segments = collections.OrderedDict()
+
+    def encode(self, message):
+        """
+        Returns given ROUTER message with its large body frames moved
+        to shared memory, or as-is.
+        """
+        self.expire()
+        if len(message) <= 5:
+            return message
+        type_frame = bytes(message[4])
+        if is_flagged(type_frame[1:]):
+            return message
+        body = list(message[5:])
+        descriptor = []
+        for index, frame in enumerate(body):
+            size = len(frame)
+            if size > self.threshold:
+                name = f'pseud-{uuid.uuid4().hex}'
+                self._write(name, frame)
+                descriptor.append((index, name, size))
+                body[index] = b''
+        if not descriptor:
+            return message
+        self.metrics['shared_memory_sent'] += len(descriptor)
+        return [
+            *message[:4],
+            type_frame[:1] + flag_codec(type_frame[1:]),
+            *body,
+            msgpack.packb(descriptor),
+        ]
+
+    def decode(self, frames):
+        """
+        Returns the body frames, with segments mapped in place of their handle.
+        """
+        frames = list(frames)
+        descriptor = msgpack.unpackb(frames.pop())
+        for index, name, size in descriptor:
+            if not _SEGMENT_NAME.fullmatch(name):
+                raise ValueError(f'Invalid shared memory segment {name!r}')
+            path = os.path.join(self.directory, name)
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                segment = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+            finally:
+                os.close(fd)
+                os.unlink(path)
+            frames[index] = memoryview(segment)
+        self.metrics['shared_memory_received'] += len(descriptor)
+        return frames
+
+    def _write(self, name, frame):
+        path = os.path.join(self.directory, name)
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+        try:
+            view = memoryview(frame).cast('B')
+            while view:
+                view = view[os.write(fd, view) :]
+        except BaseException:
+            os.unlink(path)
+            raise
+        finally:
+            os.close(fd)
+        self.segments[path] = time.monotonic() + self.timeout
+
+    def expire(self, now=None):
+        """
+        Unlink segments whose receiver did not map in time.
+        """
+        now = time.monotonic() if now is None else now
+        while self.segments:
+            path, expiration = next(iter(self.segments.items()))
+            if expiration > now:
+                break
+            del self.segments[path]
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                # received
+                continue
+            self.metrics['shared_memory_expired'] += 1
+
+    def close(self):
+        self.expire(float('inf'))
+
+
+__all__ = ('SharedMemoryTransport',)
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_ITEM = 'item'
+_RESULT = 'result'
+_END = 'end'
+_ERROR = 'error'
+
+# largest credit a CREDIT message can grant
+MAX_CREDIT = 2**32 - 1
+
+
+class ResponseStream:
+    """
+    Async iterator over the items sent by a streaming rpc-callable.
+    Stands in the future_pool of the rpc instead of a future.
+    ``timeout`` applies to the wait of every item.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.queue = asyncio.Queue()
+        # sender is done, remaining items are queued
+        self.closed = False
+        self.finished = False
+
+    def put_item(self, value):
+        self.queue.put_nowait((_ITEM, value))
+
+    def end(self):
+        self.closed = True
+        self.queue.put_nowait((_END, None))
+
+    def set_result(self, value):
+        # rpc-callable was not a generator, its result is the only item
+        self.closed = True
+        self.queue.put_nowait((_RESULT, value))
+
+    def set_exception(self, exception):
+        self.closed = True
+        self.queue.put_nowait((_ERROR, exception))
+
+    def done(self):
+        return self.finished
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.finished:
+            raise StopAsyncIteration
+        kind, value = await asyncio.wait_for(self.queue.get(), self.timeout)
+        if kind == _ITEM:
+            return value
+        self.finished = True
+        if kind == _RESULT:
+            return value
+        if kind == _ERROR:
+            raise value
+        raise StopAsyncIteration
+
+
+class InboundStream(ResponseStream):
+    """
+    Async iterator over the items sent by the caller of a client-streaming
+    rpc-callable. Credit is granted back every half ``window`` consumed.
+    """
+
+    def __init__(self, timeout, window, send_credit):
+        super().__init__(timeout)
+        self.window = window
+        self.send_credit = send_credit
+        self.consumed = 0
+
+    async def __anext__(self):
+        item = await super().__anext__()
+        if self.window is not None and not self.closed:
+            self.consumed += 1
+            if self.consumed >= max(self.window // 2, 1):
+                credit, self.consumed = self.consumed, 0
+                await self.send_credit(credit)
+        return item
+
+
+class CreditWindow:
+    """
+    Number of items the receiver of a stream is ready to accept.
+    The sender acquires one credit per item, and waits for the receiver
+    to grant more once they run out.
+    """
+
+    def __init__(self, credit=0):
+        self.credit = credit
+        self.granted = asyncio.Event()
+
+    def grant(self, credit):
+        self.credit += credit
+        self.granted.set()
+
+    async def acquire(self):
+        while self.credit <= 0:
+            self.granted.clear()
+            await self.granted.wait()
+        self.credit -= 1
+
+
+def encode_credit(credit):
+    return credit.to_bytes(4, 'big')
+
+
+def decode_credit(frame):
+    return int.from_bytes(bytes(frame), 'big')
+
+
+__all__ = (
+    'CreditWindow',
+    'InboundStream',
+    'ResponseStream',
+    'decode_credit',
+    'encode_credit',
+)
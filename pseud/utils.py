@@ -1,3 +1,6 @@
+import inspect
+import typing
+
 import zope.component
 import zope.interface
 
@@ -5,8 +8,10 @@ from .interfaces import (
     IAuthenticationBackend,
     IHeartbeatBackend,
     IPredicate,
+    IRemoteException,
     IRPCCallable,
     IRPCRoute,
+    ISerializer,
     ServiceNotFoundError,
 )
 
@@ -33,6 +38,14 @@ def register_heartbeat_backend(cls):
     return cls
 
 
+def register_serializer(cls):
+    """
+    Decorator to register Serializer plugins
+    """
+    registry.registerAdapter(cls, zope.component.adaptedBy(cls), ISerializer, cls.name)
+    return cls
+
+
 def register_predicate(cls):
     """
     Decorator to register Predicate plugins
@@ -51,14 +64,31 @@ def create_local_registry(name):
 
 @zope.interface.implementer(IRPCCallable)
 class RPCCallable:
-    def __init__(self, func, name, domain='default', with_identity=False):
+    def __init__(
+        self,
+        func,
+        name,
+        domain='default',
+        with_identity=False,
+        raw=False,
+        cacheable=None,
+        memoize=None,
+        idempotent=False,
+    ):
         self.func = func
         self.name = name
         self.domain = domain
         self.with_identity = with_identity
+        self.raw = raw
+        self.cacheable = cacheable
+        self.memoize = memoize
+        self.idempotent = idempotent
+        self.schema = _compile_schema(func, with_identity)
 
     def __call__(self, *args, **kw):
-        return self.func(*args, **kw)
+        if kw:
+            return self.func(*args, **kw)
+        return self.func(*args)
 
     def test(self, *args, **kw):
         return zope.component.getAdapter(self, IPredicate, name=self.domain).test(
@@ -66,8 +96,46 @@ class RPCCallable:
         )
 
 
+class Versioned(typing.NamedTuple):
+    """
+    Result of an rpc-callable with its version tag, conditional calls
+    are answered without encoding the value when the tag did not change.
+    """
+
+    value: typing.Any
+    tag: bytes
+
+
+def _compile_schema(func, with_identity=False):
+    """
+    Returns the names of the parameters of func a peer is allowed
+    to send positionally, in order.
+    """
+    try:
+        signature = inspect.signature(func)
+    except (TypeError, ValueError):
+        # some builtins do not expose their signature
+        return None
+    schema = []
+    for parameter in signature.parameters.values():
+        if parameter.kind != inspect.Parameter.POSITIONAL_OR_KEYWORD:
+            break
+        schema.append(parameter.name)
+    if with_identity:
+        schema = schema[1:]
+    return tuple(schema)
+
+
 def register_rpc(
-    func=None, name=None, domain='default', registry=registry, with_identity=False
+    func=None,
+    name=None,
+    domain='default',
+    registry=registry,
+    with_identity=False,
+    raw=False,
+    cacheable=None,
+    memoize=None,
+    idempotent=False,
 ):
     def wrapper(fn):
         if name is None:
@@ -77,7 +145,14 @@ def register_rpc(
         registered_name = f'{endpoint_name}:{domain}'
         registry.registerUtility(
             RPCCallable(
-                fn, name=endpoint_name, domain=domain, with_identity=with_identity
+                fn,
+                name=endpoint_name,
+                domain=domain,
+                with_identity=with_identity,
+                raw=raw,
+                cacheable=cacheable,
+                memoize=memoize,
+                idempotent=idempotent,
             ),
             IRPCRoute,
             name=registered_name,
@@ -89,6 +164,40 @@ def register_rpc(
     return wrapper
 
 
+def register_exception(cls=None, name=None, registry=registry):
+    """
+    Register an exception class, so it is rebuilt with its arguments
+    when raised by a remote rpc-callable.
+    Both peers must register it under the same name.
+    """
+
+    def wrapper(klass):
+        if name is None:
+            registered_name = f'{klass.__module__}.{klass.__qualname__}'
+        else:
+            registered_name = name
+        registry.registerUtility(klass, IRemoteException, name=registered_name)
+        return klass
+
+    if cls is not None:
+        return wrapper(cls)
+    return wrapper
+
+
+def get_exception_class(name, registry=registry):
+    return registry.queryUtility(IRemoteException, name=name)
+
+
+def get_exception_name(cls, registry=registry):
+    """
+    Returns the name the exception class is registered with, if any.
+    """
+    for name, klass in registry.getUtilitiesFor(IRemoteException):
+        if klass is cls:
+            return name
+    return None
+
+
 def get_rpc_callable(name, registry=registry, *args, **kw):
     """
     Supports predicate API (check like checking permissions)
@@ -104,3 +213,50 @@ def get_rpc_callable(name, registry=registry, *args, **kw):
         if rpc_call.test(*args, **kw):
             return rpc_call
     raise ServiceNotFoundError(name)
+
+
+def _iter_allowed_rpc_callables(registry, *args, **kw):
+    seen = set()
+    for rpc_call in registry.getAllUtilitiesRegisteredFor(IRPCRoute):
+        if rpc_call.name in seen:
+            continue
+        seen.add(rpc_call.name)
+        try:
+            yield get_rpc_callable(rpc_call.name, registry, *args, **kw)
+        except ServiceNotFoundError:
+            continue
+
+
+def get_rpc_schema(registry=registry, *args, **kw):
+    """
+    Returns mapping of names of rpc-callables allowed by predicates
+    to their compact schema.
+    """
+    return {
+        allowed.name: allowed.schema
+        for allowed in _iter_allowed_rpc_callables(registry, *args, **kw)
+        if allowed.schema is not None
+    }
+
+
+def get_rpc_cache_policies(registry=registry, *args, **kw):
+    """
+    Returns mapping of names of cacheable rpc-callables allowed
+    by predicates to the number of seconds their results can be cached.
+    """
+    return {
+        allowed.name: allowed.cacheable
+        for allowed in _iter_allowed_rpc_callables(registry, *args, **kw)
+        if allowed.cacheable
+    }
+
+
+def get_rpc_idempotent_routes(registry=registry, *args, **kw):
+    """
+    Returns the names of idempotent rpc-callables allowed by predicates.
+    """
+    return sorted(
+        allowed.name
+        for allowed in _iter_allowed_rpc_callables(registry, *args, **kw)
+        if allowed.idempotent
+    )
@@ -1,4 +1,6 @@
 import asyncio
+import functools
+import os
 
 import pytest
 
@@ -232,3 +234,1159 @@ async def test_client_can_reconnect(loop, unused_tcp_port):
         await asyncio.sleep(0.1)
         result = await client.string.upper('hello')
         assert result == 'HELLO'
+
+
+@pytest.mark.asyncio
+async def test_client_sends_keyword_arguments_positionally(loop):
+    server = make_one_server(b'server', loop)
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+
+    @server.register_rpc
+    def compute(a, b, c=3, *, d=4):
+        return a, b, c, d
+
+    async with server, client:
+        schema = await client.fetch_schema()
+        assert schema['compute'] == ('a', 'b', 'c')
+        assert client._compile_work('compute', (1,), {'b': 2, 'c': 5}) == (
+            'compute',
+            (1, 2, 5),
+        )
+        assert client._compile_work('compute', (1,), {'c': 5}) == (
+            'compute',
+            (1,),
+            {'c': 5},
+        )
+        assert await client.compute(1, b=2, c=5) == (1, 2, 5, 4)
+        assert await client.compute(1, b=2, d=6) == (1, 2, 3, 6)
+
+
+class InsufficientFunds(Exception):
+    def __init__(self, balance, requested):
+        super().__init__(balance, requested)
+        self.balance = balance
+        self.requested = requested
+
+
+@pytest.mark.asyncio
+async def test_registered_exception_round_trip(loop):
+    server = make_one_server(b'server', loop)
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    server.register_exception(InsufficientFunds)
+    client.register_exception(InsufficientFunds)
+
+    @server.register_rpc
+    def withdraw(amount):
+        raise InsufficientFunds(10, amount)
+
+    async with server, client:
+        with pytest.raises(InsufficientFunds) as excinfo:
+            await client.withdraw(20)
+        assert excinfo.value.balance == 10
+        assert excinfo.value.requested == 20
+        assert 'withdraw' in excinfo.value.remote_traceback
+
+
+@pytest.mark.asyncio
+async def test_builtin_exception_not_rebuilt(loop):
+    server = make_one_server(b'server', loop)
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+
+    @server.register_rpc
+    def decode():
+        return b'\xff'.decode()
+
+    @server.register_rpc
+    def echo(value):
+        return value
+
+    async with server, client:
+        # UnicodeDecodeError can not be built from a message only
+        with pytest.raises(Exception, match='UnicodeDecodeError') as excinfo:
+            await client.decode()
+        assert type(excinfo.value) is Exception
+        # the reader is still running
+        assert await client.echo(1) == 1
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_are_packed_off_loop(loop):
+    from pseud import Client, Server
+
+    server = Server(b'server', loop=loop, offload_threshold=1024)
+    client = Client(b'server', loop=loop, offload_threshold=1024, loop_lag_interval=0.01)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+
+    @server.register_rpc
+    def echo(data):
+        return data
+
+    payload = b'x' * 1024 * 1024
+    async with server, client:
+        assert await client.echo(payload) == payload
+        assert await client.echo(b'small') == b'small'
+        await asyncio.sleep(0.05)
+    assert server.metrics['offloaded_loads'] == 1
+    assert server.metrics['offloaded_dumps'] == 1
+    assert client.metrics['offloaded_loads'] == 1
+    assert client.metrics['offloaded_dumps'] == 1
+    assert 'loop_lag' in client.metrics
+
+
+@pytest.mark.asyncio
+async def test_large_container_arguments_are_packed_off_loop(loop):
+    from pseud import Client, Server
+
+    server = Server(b'server', loop=loop)
+    client = Client(b'server', loop=loop, offload_threshold=1024)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+
+    @server.register_rpc
+    def size(document, items=()):
+        return len(document['blob']) + len(items)
+
+    async with server, client:
+        assert await client.size({'blob': b'x' * 4096}) == 4096
+        assert client.metrics['offloaded_dumps'] == 1
+        assert await client.size({'blob': b''}, items=[b'x' * 64] * 64) == 64
+        assert client.metrics['offloaded_dumps'] == 2
+        assert await client.size({'blob': b'small'}) == 5
+        assert client.metrics['offloaded_dumps'] == 2
+
+
+@pytest.mark.asyncio
+async def test_raw_rpc(loop):
+    server1 = make_one_server(b'server1', loop)
+    server2 = make_one_server(b'server2', loop, proxy_to=server1)
+    client = make_one_client(b'server2', loop)
+    server1.bind(b'inproc://server1')
+    server2.bind(b'inproc://server2')
+    client.connect(b'inproc://server2')
+
+    @server1.register_rpc(name='bytes.reverse', raw=True)
+    def reverse(buffer):
+        assert isinstance(buffer, memoryview)
+        return bytes(buffer)[::-1]
+
+    @server1.register_rpc
+    def not_raw(buffer):
+        return buffer
+
+    async with server1, server2, client:
+        result = await client.raw.bytes.reverse(b'abc')
+        assert isinstance(result, memoryview)
+        assert result == b'cba'
+        with pytest.raises(TypeError):
+            await client.bytes.reverse(b'abc')
+        with pytest.raises(TypeError):
+            await client.raw.not_raw(b'abc')
+
+
+@pytest.mark.asyncio
+async def test_server_streaming(loop):
+    server = make_one_server(b'server', loop)
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+
+    @server.register_rpc
+    async def count(n):
+        for i in range(n):
+            await asyncio.sleep(0)
+            yield i
+
+    @server.register_rpc
+    def letters(word):
+        yield from word
+
+    @server.register_rpc
+    async def broken():
+        yield 1
+        raise ValueError('too bad')
+
+    @server.register_rpc
+    def single():
+        return 'only'
+
+    async with server, client:
+        assert [i async for i in client.stream.count(5)] == [0, 1, 2, 3, 4]
+        assert [i async for i in client.stream.letters('abc')] == ['a', 'b', 'c']
+        # awaited as a whole
+        assert await client.count(3) == (0, 1, 2)
+        assert await asyncio.create_task(client.count(2)) == (0, 1)
+        assert [i async for i in client.stream.single()] == ['only']
+        items = []
+        with pytest.raises(ValueError):
+            async for item in client.stream.broken():
+                items.append(item)
+        assert items == [1]
+        assert not client.future_pool
+
+
+@pytest.mark.asyncio
+async def test_server_streaming_cancelled_by_client(loop):
+    server = make_one_server(b'server', loop)
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    closed = asyncio.Event()
+
+    @server.register_rpc
+    async def forever():
+        try:
+            i = 0
+            while True:
+                await asyncio.sleep(0.01)
+                yield i
+                i += 1
+        finally:
+            closed.set()
+
+    async with server, client:
+        stream = client.stream_work(b'server', 'forever')
+        async for item in stream:
+            if item == 2:
+                break
+        await stream.aclose()
+        await asyncio.wait_for(closed.wait(), 1)
+        assert not server.stream_tasks
+
+
+@pytest.mark.asyncio
+async def test_server_streaming_credit(loop):
+    server = make_one_server(b'server', loop)
+    client = make_one_client(b'server', loop)
+    client.stream_window = 4
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    produced = []
+
+    @server.register_rpc
+    def count(n):
+        for i in range(n):
+            produced.append(i)
+            yield i
+
+    async with server, client:
+        stream = client.stream_work(b'server', 'count', 20)
+        assert await stream.__anext__() == 0
+        await asyncio.sleep(0.1)
+        # producer is paused once the window is used
+        assert len(produced) <= client.stream_window + 1
+        assert [i async for i in stream] == list(range(1, 20))
+        assert not server.stream_windows
+        assert not server.pending_credits
+
+
+@pytest.mark.asyncio
+async def test_push_window(loop, unused_tcp_port):
+    endpoint = f'tcp://127.0.0.1:{unused_tcp_port}'
+    server = make_one_server(b'server', loop, security_plugin='plain')
+    server.push_window = 1
+    client = make_one_client(
+        b'server', loop, user_id=b'alice', password=b'alice', security_plugin='plain'
+    )
+    server.bind(endpoint)
+    client.connect(endpoint)
+    running = []
+
+    @client.register_rpc
+    async def slow():
+        running.append(1)
+        concurrency = len(running)
+        await asyncio.sleep(0.05)
+        running.pop()
+        return concurrency
+
+    async with server, client:
+        await asyncio.sleep(0.1)
+        results = await asyncio.gather(
+            server.send_to(b'alice').slow(), server.send_to(b'alice').slow()
+        )
+        assert results == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_client_streaming(loop):
+    server = make_one_server(b'server', loop)
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    server.stream_window = 4
+
+    @server.register_rpc
+    async def total(chunks, start=0):
+        async for chunk in chunks:
+            start += chunk
+        return start
+
+    @server.register_rpc
+    async def upper(words):
+        async for word in words:
+            yield word.upper()
+
+    async def numbers(n):
+        for i in range(n):
+            yield i
+
+    async def letters():
+        for letter in 'abc':
+            yield letter
+
+    async def broken():
+        yield 1
+        raise ValueError('too bad')
+
+    async with server, client:
+        assert await client.total(numbers(100)) == 4950
+        await client.fetch_schema()
+        assert await client.total(numbers(10), start=5) == 50
+        assert [w async for w in client.stream.upper(letters())] == ['A', 'B', 'C']
+        with pytest.raises(ValueError):
+            await client.total(broken())
+        assert not server.inbound_streams
+        assert not server.stream_tasks
+        assert not client.stream_tasks
+
+
+@pytest.mark.asyncio
+async def test_batch(loop):
+    from pseud.interfaces import ServiceNotFoundError
+
+    server = make_one_server(b'server', loop)
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    calls = []
+
+    @server.register_rpc
+    async def echo(value, delay=0):
+        await asyncio.sleep(delay)
+        calls.append(value)
+        return value
+
+    @server.register_rpc
+    def count(n):
+        yield from range(n)
+
+    @server.register_rpc
+    def fail():
+        raise ValueError('too bad')
+
+    @server.register_rpc
+    def unencodable():
+        return object()
+
+    async with server, client:
+        async with client.batch() as batch:
+            first = batch.echo(1, delay=0.02)
+            second = batch.echo(2)
+            items = batch.count(3)
+            failed = batch.fail()
+            missing = batch.missing()
+            unserializable = batch.unencodable()
+        assert calls == [1, 2]
+        assert await first == 1
+        assert await second == 2
+        assert await items == (0, 1, 2)
+        with pytest.raises(ValueError):
+            await failed
+        with pytest.raises(ServiceNotFoundError):
+            await missing
+        with pytest.raises(TypeError):
+            await unserializable
+
+        calls.clear()
+        async with client.batch(ordered=False) as batch:
+            first = batch.echo(1, delay=0.02)
+            second = batch.echo(2)
+        assert calls == [2, 1]
+        assert (await first, await second) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_reply_batching(loop):
+    server = make_one_server(b'server', loop)
+    server.reply_batch_size = 8
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+
+    @server.register_rpc
+    def double(value):
+        if value < 0:
+            raise ValueError('negative')
+        return value * 2
+
+    async with server, client:
+        results = await asyncio.gather(
+            *(client.double(i) for i in range(-1, 20)), return_exceptions=True
+        )
+        assert isinstance(results[0], ValueError)
+        assert results[1:] == [i * 2 for i in range(20)]
+        assert server.metrics['coalesced_replies']
+        # a lone reply is sent as-is
+        assert await client.double(21) == 42
+        assert not server.pending_replies
+
+
+@pytest.mark.asyncio
+async def test_notification(loop):
+    server = make_one_server(b'server', loop)
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    events = []
+    received = asyncio.Event()
+
+    @server.register_rpc
+    def log_event(event, level='info'):
+        events.append((event, level))
+        received.set()
+
+    @server.register_rpc
+    def fail():
+        raise ValueError('too bad')
+
+    async with server, client:
+        assert await client.notify.fail() is None
+        assert await client.notify.log_event('start', level='debug') is None
+        await asyncio.wait_for(received.wait(), 1)
+        assert events == [('start', 'debug')]
+        assert not client.future_pool
+
+
+@pytest.mark.asyncio
+async def test_multicast(loop, unused_tcp_port):
+    endpoint = f'tcp://127.0.0.1:{unused_tcp_port}'
+    server = make_one_server(b'server', loop, security_plugin='plain')
+    clients = [
+        make_one_client(
+            b'server', loop, user_id=name, password=name, security_plugin='plain'
+        )
+        for name in (b'alice', b'bob')
+    ]
+    server.bind(endpoint)
+    received = []
+    for client in clients:
+        client.connect(endpoint)
+
+        @client.register_rpc(name='update')
+        def update(value, client=client):
+            received.append((client.user_id, value))
+            if client.user_id == b'bob':
+                raise ValueError('too bad')
+            return value * 2
+
+    async with server, clients[0], clients[1]:
+        await asyncio.sleep(0.1)
+        results = await server.multicast([b'alice', b'bob', b'carol']).update(21)
+        assert results[b'alice'] == 42
+        assert isinstance(results[b'bob'], ValueError)
+        assert isinstance(results[b'carol'], KeyError)
+        assert sorted(received) == [(b'alice', 21), (b'bob', 21)]
+        assert not server.future_pool
+
+        received.clear()
+        assert await server.multicast([b'alice'], reply=False).update(1) is None
+        await asyncio.sleep(0.1)
+        assert received == [(b'alice', 1)]
+
+
+@pytest.mark.asyncio
+async def test_publish_subscribe(loop, unused_tcp_port_factory):
+    endpoint = f'tcp://127.0.0.1:{unused_tcp_port_factory()}'
+    publisher_endpoint = f'tcp://127.0.0.1:{unused_tcp_port_factory()}'
+    server = make_one_server(b'server', loop, security_plugin='plain')
+    client = make_one_client(
+        b'server', loop, user_id=b'alice', password=b'alice', security_plugin='plain'
+    )
+    server.bind(endpoint)
+    server.bind_publisher(publisher_endpoint)
+    client.connect(endpoint)
+    client.connect_subscriber(publisher_endpoint)
+
+    async with server, client:
+        prices = client.subscribe('prices.')
+        for _ in range(100):
+            if server.publisher.has_subscribers(b'prices.eur'):
+                break
+            await asyncio.sleep(0.01)
+        # nobody listens, nothing is encoded
+        assert not await server.publish('news.sport', 'goal')
+        assert await server.publish('prices.eur', {'bid': 1.1})
+        topic, value = await asyncio.wait_for(prices.__anext__(), 1)
+        assert topic == b'prices.eur'
+        assert value == {'bid': 1.1}
+        prices.close()
+        for _ in range(100):
+            if not server.publisher.has_subscribers(b'prices.eur'):
+                break
+            await asyncio.sleep(0.01)
+        assert not await server.publish('prices.eur', {'bid': 1.2})
+
+
+@pytest.mark.asyncio
+async def test_client_cache(loop):
+    from pseud import Client
+
+    server = make_one_server(b'server', loop)
+    client = Client(b'server', loop=loop, cache_size=1024)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    calls = []
+
+    @server.register_rpc(name='users.get', cacheable=60)
+    def get_user(user_id):
+        calls.append(user_id)
+        return {'id': user_id, 'name': 'alice'}
+
+    @server.register_rpc(name='users.big', cacheable=60)
+    def big():
+        calls.append('big')
+        return 'x' * 2048
+
+    @server.register_rpc(name='users.set')
+    def set_user(user_id):
+        calls.append(user_id)
+
+    async with server, client:
+        await client.fetch_schema()
+        assert client.cache_policies == {'users.get': 60, 'users.big': 60}
+        assert await client.users.get(1) == {'id': 1, 'name': 'alice'}
+        assert await client.users.get(1) == {'id': 1, 'name': 'alice'}
+        await client.users.get(2)
+        assert calls == [1, 2]
+        assert client.metrics['cache_hits'] == 1
+        assert client.metrics['cache_misses'] == 2
+        # not cacheable, or too big
+        await client.users.set(1)
+        await client.users.set(1)
+        await client.users.big()
+        await client.users.big()
+        assert calls == [1, 2, 1, 1, 'big', 'big']
+
+        await server.invalidate('users.')
+        for _ in range(100):
+            if not client.cache.entries:
+                break
+            await asyncio.sleep(0.01)
+        await client.users.get(1)
+        assert calls[-1] == 1
+
+
+@pytest.mark.asyncio
+async def test_server_memoization(loop):
+    from pseud import Server
+
+    server = Server(b'server', loop=loop, memo_size=1024)
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    calls = []
+
+    @server.register_rpc(memoize=60)
+    async def expensive(n):
+        calls.append(n)
+        await asyncio.sleep(0.05)
+        return n * 2
+
+    @server.register_rpc(memoize=60)
+    def broken():
+        calls.append('broken')
+        raise ValueError('too bad')
+
+    async with server, client:
+        results = await asyncio.gather(*(client.expensive(21) for _ in range(5)))
+        assert results == [42] * 5
+        assert calls == [21]
+        assert server.metrics['memo_shared'] == 4
+        # kept once computed
+        assert await client.expensive(21) == 42
+        assert server.metrics['memo_hits'] == 1
+        assert await client.expensive(1) == 2
+        assert calls == [21, 1]
+        for _ in range(2):
+            with pytest.raises(ValueError):
+                await client.broken()
+        assert calls == [21, 1, 'broken', 'broken']
+        assert not server.memo_inflight
+
+
+@pytest.mark.asyncio
+async def test_versioned_results_of_every_path(loop):
+    from pseud import Server
+    from pseud.utils import Versioned
+
+    server = Server(b'server', loop=loop, memo_size=1024)
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+
+    @server.register_rpc
+    def config():
+        return Versioned({'a': 1}, b'v1')
+
+    @server.register_rpc(memoize=60)
+    def memoized_config():
+        return Versioned({'a': 1}, b'v1')
+
+    async with server, client:
+        assert await client.config() == {'a': 1}
+        assert await client.memoized_config() == {'a': 1}
+        async with client.batch() as batch:
+            batched = batch.config()
+        assert await batched == {'a': 1}
+
+
+@pytest.mark.asyncio
+async def test_conditional_calls(loop):
+    from pseud.utils import Versioned
+
+    server = make_one_server(b'server', loop)
+    client = make_one_client(b'server', loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    config = {'version': 1, 'blob': 'x' * 1000}
+
+    @server.register_rpc
+    def get_config(section):
+        return {'section': section, **config}
+
+    @server.register_rpc
+    def get_tagged_config():
+        return Versioned(config, str(config['version']))
+
+    async with server, client:
+        first = await client.conditional.get_config('main')
+        assert first['version'] == 1
+        assert await client.conditional.get_config('main') == first
+        assert server.metrics['not_modified'] == 1
+        # other arguments, other result
+        assert (await client.conditional.get_config('other'))['section'] == 'other'
+        config['version'] = 2
+        assert (await client.conditional.get_config('main'))['version'] == 2
+        assert server.metrics['not_modified'] == 1
+
+        assert (await client.conditional.get_tagged_config())['version'] == 2
+        assert (await client.conditional.get_tagged_config())['version'] == 2
+        assert server.metrics['not_modified'] == 2
+        # regular calls receive the value
+        assert (await client.get_tagged_config())['version'] == 2
+        assert not client.conditional_calls
+
+
+@pytest.mark.asyncio
+async def test_conditional_calls_with_v1_work(loop):
+    from pseud import Client
+    from pseud.interfaces import VERSION
+
+    server = make_one_server(b'server', loop)
+    client = Client(b'server', loop=loop, timeout=1, work_version=VERSION)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+
+    @server.register_rpc
+    def get_config():
+        return {'version': 1}
+
+    async with server, client:
+        assert await client.get_config() == {'version': 1}
+        # conditional calls are always sent with the v2 layout
+        assert await client.conditional.get_config() == {'version': 1}
+        assert await client.conditional.get_config() == {'version': 1}
+        assert server.metrics['not_modified'] == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_is_not_executed_twice(loop):
+    from pseud import Client, Server
+
+    server = Server(b'server', loop=loop, reply_cache_size=1024)
+    client = Client(b'server', loop=loop, timeout=0.1)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    calls = []
+
+    @server.register_rpc
+    async def slow(value):
+        calls.append(value)
+        if len(calls) == 1:
+            await asyncio.sleep(0.15)
+        return value
+
+    async with server, client:
+        assert await client.retrying(3).slow(1) == 1
+        assert calls == [1]
+        assert client.metrics['retries'] == 1
+        assert client.retry_budget.tokens < client.retry_budget.reserve
+        # another call is executed
+        assert await client.retrying(3).slow(1) == 1
+        assert calls == [1, 1]
+
+
+@pytest.mark.asyncio
+async def test_retry_is_not_timed_out_by_previous_attempt(loop):
+    from pseud import Client, Server
+    from pseud.retry import RetryPolicy
+
+    server = Server(b'server', loop=loop)
+    client = Client(b'server', loop=loop, timeout=0.1)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    calls = []
+
+    @server.register_rpc
+    async def flaky():
+        calls.append(None)
+        if len(calls) == 1:
+            raise ValueError('try again')
+        await asyncio.sleep(0.07)
+        return 'done'
+
+    policy = RetryPolicy(3, backoff=0.05, retry_on=(ValueError,))
+    async with server, client:
+        # the timer of the first attempt would fire during the second one
+        assert await client.retrying(policy).flaky() == 'done'
+        assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_policy_of_idempotent_routes(loop):
+    from pseud import Client, Server
+    from pseud.retry import RetryPolicy
+
+    server = Server(b'server', loop=loop)
+    client = Client(
+        b'server',
+        loop=loop,
+        timeout=0.1,
+        retry_policy=RetryPolicy(attempts=2, backoff=0.01),
+    )
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    calls = []
+
+    @server.register_rpc(idempotent=True)
+    async def lookup():
+        calls.append('lookup')
+        if len(calls) == 1:
+            await asyncio.sleep(0.15)
+        return 'found'
+
+    @server.register_rpc
+    async def update():
+        calls.append('update')
+        await asyncio.sleep(0.15)
+
+    async with server, client:
+        await client.fetch_schema()
+        assert client.idempotent_routes == {'lookup'}
+        assert await client.lookup() == 'found'
+        assert calls == ['lookup', 'lookup']
+        assert client.metrics['retries_succeeded'] == 1
+        with pytest.raises(asyncio.TimeoutError):
+            await client.update()
+        assert client.metrics['retries'] == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker(loop):
+    from pseud import Client, Server
+    from pseud.breaker import CircuitBreaker
+    from pseud.interfaces import CircuitOpenError
+
+    server = Server(b'server', loop=loop)
+    client = Client(
+        b'server',
+        loop=loop,
+        timeout=0.05,
+        circuit_breaker=functools.partial(
+            CircuitBreaker, minimum_calls=2, reset_timeout=0.2
+        ),
+    )
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+    delays = [0.1, 0.1]
+
+    @server.register_rpc
+    async def work():
+        if delays:
+            await asyncio.sleep(delays.pop())
+        return 'done'
+
+    async with server, client:
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await client.work()
+        with pytest.raises(CircuitOpenError):
+            await client.work()
+        assert client.metrics['circuit_open'] == 1
+        assert client.metrics['circuit_rejected'] == 1
+        assert client.metrics['open_circuits'] == 1
+        await asyncio.sleep(0.2)
+        assert await client.work() == 'done'
+        assert client.metrics['circuit_half_open'] == 1
+        assert client.metrics['circuit_closed'] == 1
+        assert client.metrics['open_circuits'] == 0
+
+
+@pytest.mark.asyncio
+async def test_multicast_skips_open_circuits(loop, unused_tcp_port):
+    from pseud import Server
+    from pseud.breaker import CircuitBreaker
+    from pseud.interfaces import CircuitOpenError
+
+    endpoint = f'tcp://127.0.0.1:{unused_tcp_port}'
+    server = Server(
+        b'server',
+        loop=loop,
+        security_plugin='plain',
+        circuit_breaker=functools.partial(CircuitBreaker, minimum_calls=1),
+    )
+    client = make_one_client(
+        b'server', loop, user_id=b'alice', password=b'alice', security_plugin='plain'
+    )
+    server.bind(endpoint)
+    client.connect(endpoint)
+    received = []
+
+    @client.register_rpc(name='update')
+    async def update(value):
+        received.append(value)
+        await asyncio.sleep(0.1)
+
+    async with server, client:
+        await asyncio.sleep(0.1)
+        results = await server.multicast([b'alice'], timeout=0.05).update(1)
+        assert isinstance(results[b'alice'], asyncio.TimeoutError)
+        results = await server.multicast([b'alice'], timeout=0.05).update(2)
+        assert isinstance(results[b'alice'], CircuitOpenError)
+        await asyncio.sleep(0.1)
+        assert received == [1]
+
+
+@pytest.mark.asyncio
+async def test_durable_work_is_sent_again(loop, tmp_path):
+    from pseud import Client, Server
+    from pseud.durable import DurableLog
+
+    path = str(tmp_path / 'outbox.db')
+    client = Client(b'server', loop=loop, timeout=0.1, durable_log=path)
+    client.connect(b'inproc://durable')
+    async with client:
+        # server is not running yet
+        with pytest.raises(asyncio.TimeoutError):
+            await client.durable.work(1)
+
+    server = Server(b'server', loop=loop, reply_cache_size=1024)
+    server.bind(b'inproc://durable')
+    received = []
+
+    @server.register_rpc
+    def work(value):
+        received.append(value)
+        return value
+
+    client = Client(b'server', loop=loop, durable_log=path)
+    client.connect(b'inproc://durable')
+    async with server, client:
+        assert await client.durable.work(2) == 2
+        await client.durable_replays
+        assert sorted(received) == [1, 2]
+        assert client.metrics['durable_replays'] == 1
+
+    log = DurableLog(path)
+    assert await log.pending() == []
+    await log.close()
+
+
+@pytest.mark.asyncio
+async def test_durable_replay_answered_from_reply_cache(
+    loop, unused_tcp_port, tmp_path, plain_auth_backend
+):
+    from pseud import Client, Server
+
+    endpoint = f'tcp://127.0.0.1:{unused_tcp_port}'
+    path = str(tmp_path / 'outbox.db')
+    server = Server(b'server', loop=loop, security_plugin='plain', reply_cache_size=1024)
+    server.bind(endpoint)
+    received = []
+
+    @server.register_rpc
+    async def work(value):
+        received.append(value)
+        if len(received) == 1:
+            await asyncio.sleep(0.15)
+        return value
+
+    def make_client(**kw):
+        client = Client(
+            b'server',
+            loop=loop,
+            user_id=b'alice',
+            password=b'alice',
+            security_plugin='plain',
+            durable_log=path,
+            **kw,
+        )
+        client.connect(endpoint)
+        return client
+
+    async with server:
+        client = make_client(timeout=0.1)
+        async with client:
+            with pytest.raises(asyncio.TimeoutError):
+                await client.durable.work(1)
+        await asyncio.sleep(0.1)
+        # restarted with another routing id, the reply is found for alice
+        client = make_client()
+        async with client:
+            await client.durable_replays
+            assert client.metrics['durable_replays'] == 1
+        assert received == [1]
+        assert server.metrics['duplicate_hits'] == 1
+
+
+@pytest.mark.asyncio
+async def test_remote_ref(loop):
+    from pseud import Client, Server
+    from pseud.interfaces import ServiceNotFoundError
+    from pseud.remote import RemoteProxy, RemoteRef
+
+    server = Server(b'server', loop=loop)
+    client = Client(b'server', loop=loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+
+    class Dataset:
+        def __init__(self, size):
+            self.rows = list(range(size))
+
+        def count(self):
+            return len(self.rows)
+
+        def get(self, index):
+            return self.rows[index]
+
+        def _secret(self):
+            return 'secret'
+
+    @server.register_rpc
+    def load(size):
+        return RemoteRef(Dataset(size), lease=10)
+
+    async with server, client:
+        async with await client.load(100_000) as dataset:
+            assert isinstance(dataset, RemoteProxy)
+            assert await dataset.count() == 100_000
+            assert await dataset.get(42) == 42
+            assert server.metrics['remote_refs'] == 1
+            with pytest.raises(ServiceNotFoundError):
+                await dataset.missing()
+            with pytest.raises(AttributeError):
+                dataset._secret  # noqa: B018
+            with pytest.raises(ServiceNotFoundError):
+                await client.send_work(
+                    b'server', f'pseud.ref.{dataset._handle.ref_id}._secret'
+                )
+        assert server.metrics['remote_refs'] == 0
+        with pytest.raises(ServiceNotFoundError):
+            await dataset.count()
+
+
+@pytest.mark.asyncio
+async def test_remote_ref_of_every_path(loop):
+    from pseud import Client, Server
+    from pseud.remote import RemoteHandle, RemoteProxy, RemoteRef
+
+    server = Server(b'server', loop=loop, memo_size=1024)
+    client = Client(b'server', loop=loop)
+    server.bind(b'inproc://server')
+    client.connect(b'inproc://server')
+
+    @server.register_rpc(memoize=10)
+    def memoized():
+        return RemoteRef([1, 2, 3])
+
+    @server.register_rpc
+    def plain():
+        return RemoteRef([1, 2, 3])
+
+    @server.register_rpc
+    async def uploaded(items):
+        return RemoteRef([item async for item in items])
+
+    async def items():
+        yield 1
+        yield 2
+
+    async with server, client:
+        proxy = await client.memoized()
+        assert isinstance(proxy, RemoteProxy)
+        assert await proxy.count(1) == 1
+        # handles are owned by their caller, not memoized
+        assert (await client.memoized())._handle != proxy._handle
+        async with client.batch() as batch:
+            batched = batch.plain()
+        assert isinstance(await batched, RemoteHandle)
+        assert isinstance(await client.uploaded(items()), RemoteHandle)
+        assert server.metrics['remote_refs'] == 4
+
+
+@pytest.mark.asyncio
+async def test_shared_memory(loop, tmp_path):
+    from pseud import Client, Server
+
+    endpoint = f'ipc://{tmp_path}/server.sock'
+    segments = tmp_path / 'shm'
+    segments.mkdir()
+    server = Server(
+        b'server',
+        loop=loop,
+        shared_memory_threshold=1024,
+        shared_memory_dir=str(segments),
+    )
+    client = Client(
+        b'server',
+        loop=loop,
+        shared_memory_threshold=1024,
+        shared_memory_dir=str(segments),
+    )
+    server.bind(endpoint)
+    client.connect(endpoint)
+
+    @server.register_rpc
+    def reverse(data):
+        return data[::-1]
+
+    payload = os.urandom(100_000)
+    async with server, client:
+        assert await client.reverse(payload) == payload[::-1]
+        assert await client.reverse(b'small') == b'llams'
+        assert client.metrics['shared_memory_sent'] == 1
+        assert server.metrics['shared_memory_received'] == 1
+        assert server.metrics['shared_memory_sent'] == 1
+        assert client.metrics['shared_memory_received'] == 1
+        assert list(segments.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_local_dispatch(loop):
+    from pseud import Client, Server
+    from pseud.interfaces import ServiceNotFoundError
+
+    server = Server(b'server', loop=loop)
+    server.bind(b'inproc://local')
+    client = Client(b'server', loop=loop, local_dispatch=True)
+    client.connect(b'inproc://local')
+    sharing_client = Client(b'server', loop=loop, local_dispatch=True, local_copy=False)
+    sharing_client.connect(b'inproc://local')
+    server.register_exception(InsufficientFunds)
+    client.register_exception(InsufficientFunds)
+    state = {'items': [1, 2]}
+
+    @server.register_rpc
+    def append(items, value):
+        items.append(value)
+        return items
+
+    @server.register_rpc
+    def get_state():
+        return state
+
+    @server.register_rpc
+    async def countdown(start):
+        for i in range(start, 0, -1):
+            yield i
+
+    @server.register_rpc
+    def withdraw(amount):
+        raise InsufficientFunds(10, amount)
+
+    async with server, client, sharing_client:
+        assert client.local_peer is server
+        items = [1]
+        assert await client.append(items, 2) == [1, 2]
+        assert items == [1]
+        (await client.get_state())['items'].append(3)
+        assert state == {'items': [1, 2]}
+        assert await sharing_client.get_state() is state
+        assert await client.countdown(3) == (3, 2, 1)
+        with pytest.raises(InsufficientFunds) as excinfo:
+            await client.withdraw(20)
+        assert excinfo.value.requested == 20
+        assert 'withdraw' in excinfo.value.remote_traceback
+        with pytest.raises(ServiceNotFoundError):
+            await client.missing()
+        assert client.metrics['local_calls'] == 5
+        assert client.local_user_id is not None
+
+
+@pytest.mark.asyncio
+async def test_local_dispatch_keeps_client_features(loop):
+    from pseud import Client, Server
+    from pseud.breaker import CircuitBreaker
+    from pseud.interfaces import CircuitOpenError
+
+    backend = Server(b'backend', loop=loop)
+    backend.bind(b'inproc://local_backend')
+    server = Server(b'server', loop=loop, proxy_to=backend)
+    server.bind(b'inproc://local_features')
+    client = Client(
+        b'server',
+        loop=loop,
+        timeout=0.05,
+        local_dispatch=True,
+        cache_size=1024,
+        circuit_breaker=functools.partial(
+            CircuitBreaker, failure_rate=0.25, reset_timeout=60
+        ),
+    )
+    client.connect(b'inproc://local_features')
+    calls = []
+
+    @backend.register_rpc
+    def proxied(value):
+        return value
+
+    @server.register_rpc(cacheable=60)
+    def cached(value):
+        calls.append(value)
+        return value
+
+    @server.register_rpc(cacheable=60)
+    def add(a, b=0):
+        return a + b
+
+    @server.register_rpc
+    async def slow():
+        await asyncio.sleep(0.1)
+
+    async with backend, server, client:
+        await client.fetch_schema()
+        # found through proxy_to
+        assert await client.proxied(1) == 1
+        assert await client.cached(1) == 1
+        assert await client.cached(1) == 1
+        assert calls == [1]
+        # schema and cache policies are fetched locally too
+        assert client.metrics['local_calls'] == 4
+        # keyword arguments sent positionally are still given locally
+        assert await client.add(1, b=2) == 3
+        assert await client.add(1, b=2) == 3
+        assert client.metrics['local_calls'] == 5
+        for _ in range(2):
+            with pytest.raises(asyncio.TimeoutError):
+                await client.slow()
+        with pytest.raises(CircuitOpenError):
+            await client.proxied(2)
+        assert client.metrics['local_calls'] == 7
@@ -0,0 +1,37 @@
+def test_circuit_breaker(monkeypatch):
+    from pseud import breaker
+
+    now = [0.0]
+    monkeypatch.setattr(breaker.time, 'monotonic', lambda: now[0])
+    circuit = breaker.CircuitBreaker(
+        failure_rate=0.5, window=4, minimum_calls=4, reset_timeout=10
+    )
+    for failed in (True, False, False):
+        assert circuit.record(circuit.allow(), failed) == breaker.CLOSED
+    assert circuit.record(circuit.allow(), True) == breaker.OPEN
+    assert circuit.allow() is None
+
+    now[0] = 10
+    probe = circuit.allow()
+    assert probe == breaker.HALF_OPEN
+    # a single probe at a time
+    assert circuit.allow() is None
+    assert circuit.record(probe, True) == breaker.OPEN
+    assert circuit.allow() is None
+
+    now[0] = 20
+    probe = circuit.allow()
+    # cancelled probe gives its place back
+    assert circuit.record(probe, None) == breaker.HALF_OPEN
+    probe = circuit.allow()
+    assert circuit.record(probe, False) == breaker.CLOSED
+    assert not circuit.outcomes
+
+
+def test_circuit_breaker_ignores_stale_outcomes():
+    from pseud import breaker
+
+    circuit = breaker.CircuitBreaker(minimum_calls=1)
+    state = circuit.allow()
+    assert circuit.record(circuit.allow(), True) == breaker.OPEN
+    assert circuit.record(state, False) == breaker.OPEN
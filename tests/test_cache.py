@@ -0,0 +1,38 @@
+from collections import Counter
+
+
+def test_result_cache_lru_and_ttl(monkeypatch):
+    from pseud import cache
+
+    now = [0.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    metrics = Counter()
+    result_cache = cache.ResultCache(100, metrics)
+    result_cache.set(('a', b'1'), 'a1', 40, 10, 0)
+    result_cache.set(('a', b'2'), 'a2', 40, 10, 0)
+    assert result_cache.get(('a', b'1')) == 'a1'
+    # least recently used is evicted
+    result_cache.set(('b', b'1'), 'b1', 40, 1, 0)
+    assert result_cache.get(('a', b'2')) is None
+    assert result_cache.size == 80
+    assert metrics['cache_evictions'] == 1
+    now[0] = 2
+    assert result_cache.get(('b', b'1')) is None
+    assert result_cache.get(('a', b'1')) == 'a1'
+    assert metrics['cache_hits'] == 2
+    assert metrics['cache_misses'] == 2
+
+
+def test_result_cache_invalidate():
+    from pseud.cache import ResultCache
+
+    result_cache = ResultCache(100, Counter())
+    result_cache.set(('users.get', b'1'), 'alice', 10, 10, 0)
+    result_cache.set(('groups.get', b'1'), 'admins', 10, 10, 0)
+    generation = result_cache.generation
+    result_cache.invalidate('users.')
+    assert result_cache.get(('users.get', b'1')) is None
+    assert result_cache.get(('groups.get', b'1')) == 'admins'
+    # result of a call sent before the invalidation is not stored
+    result_cache.set(('users.get', b'1'), 'alice', 10, 10, generation)
+    assert result_cache.get(('users.get', b'1')) is None
@@ -76,7 +76,7 @@ async def test_client_method_wrapper(loop):
 
 @pytest.mark.asyncio
 async def test_job_executed(loop, unused_tcp_port):
-    from pseud.interfaces import OK, VERSION, WORK
+    from pseud.interfaces import OK, VERSION, VERSION_2, WORK
     from pseud.packer import Packer
 
     peer_routing_id = b'echo'
@@ -90,27 +90,67 @@ async def test_job_executed(loop, unused_tcp_port):
         assert len(probing) == 2
         future = asyncio.ensure_future(client.please.do_that_job(1, 2, 3, b=4))
         request = await socket.recv_multipart()
-        client_routing_id, delimiter, version, uid, message_type, message = request
+        (
+            client_routing_id,
+            delimiter,
+            version,
+            uid,
+            message_type,
+            locator,
+            message,
+        ) = request
         assert delimiter == b''
-        assert version == VERSION
+        assert version == VERSION_2
         assert uid
         # check it is a real uuid
         uuid.UUID(bytes=uid)
         assert message_type == WORK
-        locator, args, kw = Packer().unpackb(message)
-        assert locator == 'please.do_that_job'
+        args, kw = Packer().unpackb(message)
+        assert locator == b'please.do_that_job'
         assert args == (1, 2, 3)
         assert kw == {'b': 4}
-        reply = [client_routing_id, b'', version, uid, OK, Packer().packb(True)]
+        reply = [client_routing_id, b'', VERSION, uid, OK, Packer().packb(True)]
         await socket.send_multipart(reply)
         result = await future
         assert result is True
         assert not client.future_pool
 
 
+@pytest.mark.asyncio
+async def test_job_sent_with_v1_layout(loop, unused_tcp_port):
+    from pseud import Client
+    from pseud.interfaces import OK, VERSION, WORK
+    from pseud.packer import Packer
+
+    peer_routing_id = b'echo'
+    endpoint = f'tcp://127.0.0.1:{unused_tcp_port}'
+    socket = make_one_server_socket(peer_routing_id, endpoint)
+    client = Client(peer_routing_id, loop=loop, work_version=VERSION)
+    client.connect(endpoint)
+
+    async with client:
+        await socket.recv_multipart()
+        future = asyncio.ensure_future(client.please.do_that_job(1, b=4))
+        (
+            client_routing_id,
+            _,
+            version,
+            uid,
+            message_type,
+            message,
+        ) = await socket.recv_multipart()
+        assert version == VERSION
+        assert message_type == WORK
+        assert Packer().unpackb(message) == ('please.do_that_job', (1,), {'b': 4})
+        await socket.send_multipart(
+            [client_routing_id, b'', VERSION, uid, OK, Packer().packb(True)]
+        )
+        assert await future is True
+
+
 @pytest.mark.asyncio
 async def test_job_server_never_reply(loop):
-    from pseud.interfaces import VERSION, WORK
+    from pseud.interfaces import VERSION_2, WORK
     from pseud.packer import Packer
 
     peer_routing_id = b'echo'
@@ -125,15 +165,15 @@ async def test_job_server_never_reply(loop):
         future = asyncio.ensure_future(client.please.do_that_job(1, 2, 3, b=4))
         await asyncio.sleep(0.1)
         request = await socket.recv_multipart()
-        _, delimiter, version, uid, message_type, message = request
+        _, delimiter, version, uid, message_type, locator, message = request
         assert delimiter == b''
-        assert version == VERSION
+        assert version == VERSION_2
         assert uid
         # check it is a real uuid
         uuid.UUID(bytes=uid)
         assert message_type == WORK
-        locator, args, kw = Packer().unpackb(message)
-        assert locator == 'please.do_that_job'
+        args, kw = Packer().unpackb(message)
+        assert locator == b'please.do_that_job'
         assert args == (1, 2, 3)
         assert kw == {'b': 4}
         with pytest.raises(asyncio.TimeoutError):
@@ -154,3 +194,14 @@ def test_client_registry():
         return 'bar'
 
     assert get_rpc_callable(name='foo', registry=client.registry)() == 'bar'
+
+
+def test_error_log_rate_limiter():
+    from pseud.common import RateLimiter
+
+    limiter = RateLimiter(2)
+    assert limiter.allow()
+    assert limiter.allow()
+    assert not limiter.allow()
+    assert limiter.suppressed == 1
+    assert RateLimiter(None).allow()
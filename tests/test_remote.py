@@ -0,0 +1,82 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+
+def test_remote_ref_table(monkeypatch):
+    from pseud import remote
+    from pseud.interfaces import ServiceNotFoundError
+
+    now = [0.0]
+    monkeypatch.setattr(remote.time, 'monotonic', lambda: now[0])
+    metrics = Counter()
+    table = remote.RemoteRefTable(metrics)
+    handle = table.add(remote.RemoteRef('data', lease=10), b'alice')
+    other = table.add(remote.RemoteRef('other', lease=10), b'alice')
+    assert metrics['remote_refs'] == 2
+    assert table.get(handle.ref_id, b'alice') == 'data'
+    with pytest.raises(ServiceNotFoundError):
+        table.get(handle.ref_id, b'bob')
+
+    # calls renew the lease
+    now[0] = 8
+    assert table.get(handle.ref_id, b'alice') == 'data'
+    now[0] = 12
+    table.expire()
+    assert metrics['remote_refs_expired'] == 1
+    with pytest.raises(ServiceNotFoundError):
+        table.get(other.ref_id, b'alice')
+    assert table.get(handle.ref_id, b'alice') == 'data'
+
+    table.release(handle.ref_id, b'bob')
+    assert metrics['remote_refs'] == 1
+    table.release(handle.ref_id, b'alice')
+    assert metrics['remote_refs'] == 0
+
+
+def test_remote_ref_table_expires_on_get(monkeypatch):
+    from pseud import remote
+    from pseud.interfaces import ServiceNotFoundError
+
+    now = [0.0]
+    monkeypatch.setattr(remote.time, 'monotonic', lambda: now[0])
+    metrics = Counter()
+    table = remote.RemoteRefTable(metrics)
+    table.add(remote.RemoteRef('long', lease=100), b'alice')
+    # behind a longer lease, not dropped by expire()
+    short = table.add(remote.RemoteRef('short', lease=1), b'alice')
+    now[0] = 2
+    with pytest.raises(ServiceNotFoundError):
+        table.get(short.ref_id, b'alice')
+    assert short.ref_id not in table.entries
+    assert metrics['remote_refs_expired'] == 1
+    assert metrics['remote_refs'] == 1
+
+
+@pytest.mark.asyncio
+async def test_remote_ref_table_sweep():
+    from pseud import remote
+
+    metrics = Counter()
+    table = remote.RemoteRefTable(metrics)
+    table.add(remote.RemoteRef('long', lease=60), b'alice')
+    table.add(remote.RemoteRef('short', lease=0.05), b'alice')
+    table.start(asyncio.get_running_loop())
+    assert table.sweeper is not None
+    await asyncio.sleep(0.1)
+    assert metrics['remote_refs_expired'] == 1
+    assert metrics['remote_refs'] == 1
+    # scheduled again for the remaining reference
+    assert table.sweeper is not None
+    table.clear()
+    assert table.sweeper is None
+
+
+def test_remote_handle_is_packed():
+    from pseud import Client
+    from pseud.remote import RemoteHandle
+
+    packer = Client(b'server').packer
+    handle = RemoteHandle('0123456789abcdef')
+    assert packer.unpackb(packer.packb([handle])) == (handle,)
@@ -0,0 +1,79 @@
+import asyncio
+from collections import Counter
+
+import pytest
+
+
+def test_retry_budget():
+    from pseud.retry import RetryBudget
+
+    budget = RetryBudget(ratio=0.5, reserve=2)
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_retry_policy_delay_is_capped():
+    from pseud.retry import RetryPolicy
+
+    policy = RetryPolicy(backoff=1, max_backoff=3)
+    assert 0 <= policy.delay(1) <= 1
+    assert 0 <= policy.delay(10) <= 3
+    with pytest.raises(ValueError):
+        RetryPolicy(attempts=0)
+
+
+@pytest.mark.asyncio
+async def test_retry_policy_run():
+    from pseud.retry import RetryBudget, RetryPolicy
+
+    metrics = Counter()
+    failures = [asyncio.TimeoutError(), asyncio.TimeoutError()]
+
+    async def send():
+        if failures:
+            raise failures.pop()
+        return 'ok'
+
+    policy = RetryPolicy(attempts=3, backoff=0)
+    assert await policy.run(send, metrics, 'name') == 'ok'
+    assert metrics['retries'] == 2
+    assert metrics['retries_succeeded'] == 1
+
+    failures[:] = [asyncio.TimeoutError(), asyncio.TimeoutError()]
+    with pytest.raises(asyncio.TimeoutError):
+        await RetryPolicy(attempts=2, backoff=0).run(send, metrics, 'name')
+    assert metrics['retries_exhausted'] == 1
+
+    failures[:] = [asyncio.TimeoutError()]
+    policy = RetryPolicy(backoff=0, budget=RetryBudget(reserve=0))
+    with pytest.raises(asyncio.TimeoutError):
+        await policy.run(send, metrics, 'name')
+    assert metrics['retries_over_budget'] == 1
+
+    failures[:] = [ValueError()]
+    with pytest.raises(ValueError):
+        await RetryPolicy(backoff=0).run(send, metrics, 'name')
+
+
+@pytest.mark.asyncio
+async def test_retry_budget_shared_by_policies():
+    from pseud.retry import RetryBudget, RetryPolicy
+
+    metrics = Counter()
+    budget = RetryBudget(ratio=0, reserve=1)
+
+    async def send():
+        raise asyncio.TimeoutError()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await RetryPolicy(attempts=2, backoff=0).run(send, metrics, 'name', budget)
+    assert metrics['retries'] == 1
+    # the reserve is spent by the first policy
+    with pytest.raises(asyncio.TimeoutError):
+        await RetryPolicy(attempts=2, backoff=0).run(send, metrics, 'name', budget)
+    assert metrics['retries_over_budget'] == 1
@@ -83,3 +83,77 @@ def test_registration_with_custom_registry():
 
     assert get_rpc_callable('try_to_call_me')() == 'global'
     assert get_rpc_callable('try_to_call_me', registry=local_registry)() == 'local'
+
+
+def test_rpc_schema():
+    from pseud.utils import create_local_registry, get_rpc_schema, register_rpc
+
+    local_registry = create_local_registry('schema')
+
+    @register_rpc(registry=local_registry)
+    def compute(a, b, c=None, *args, d=None, **kw):
+        pass
+
+    @register_rpc(registry=local_registry, with_identity=True)
+    def whoami(user_id, greeting):
+        pass
+
+    @register_rpc(name='admin.only', domain='restricted', registry=local_registry)
+    def admin_only(a):
+        pass
+
+    register_rpc(name='str.upper', registry=local_registry)(str.upper)
+
+    schema = get_rpc_schema(local_registry)
+    assert schema['compute'] == ('a', 'b', 'c')
+    assert schema['whoami'] == ('greeting',)
+    assert schema['str.upper'] == ()
+    assert 'admin.only' not in schema
+
+
+def test_rpc_cache_policies():
+    from pseud.utils import (
+        create_local_registry,
+        get_rpc_cache_policies,
+        register_rpc,
+    )
+
+    local_registry = create_local_registry('cache_policies')
+
+    @register_rpc(registry=local_registry, cacheable=60)
+    def lookup(a):
+        pass
+
+    @register_rpc(registry=local_registry)
+    def update(a):
+        pass
+
+    @register_rpc(domain='restricted', registry=local_registry, cacheable=60)
+    def secret(a):
+        pass
+
+    assert get_rpc_cache_policies(local_registry) == {'lookup': 60}
+
+
+def test_rpc_idempotent_routes():
+    from pseud.utils import (
+        create_local_registry,
+        get_rpc_idempotent_routes,
+        register_rpc,
+    )
+
+    local_registry = create_local_registry('idempotent_routes')
+
+    @register_rpc(registry=local_registry, idempotent=True)
+    def lookup(a):
+        pass
+
+    @register_rpc(registry=local_registry)
+    def update(a):
+        pass
+
+    @register_rpc(domain='restricted', registry=local_registry, idempotent=True)
+    def secret(a):
+        pass
+
+    assert get_rpc_idempotent_routes(local_registry) == ['lookup']
@@ -71,3 +71,151 @@ def test_packer_translation():
 
     dumb_packer = Packer()
     dumb_packer.unpackb(packer.packb(A('')))
+
+
+def test_serializers_verify_interface():
+    import zope.interface.verify
+
+    from pseud.interfaces import ISerializer
+    from pseud.serializer import MsgpackSerializer, PickleSerializer, RawSerializer
+
+    for klass in (MsgpackSerializer, PickleSerializer, RawSerializer):
+        zope.interface.verify.verifyClass(ISerializer, klass)
+
+
+def test_pickle_serializer_out_of_band_buffers():
+    import pickle
+
+    from pseud import Client
+    from pseud.serializer import PickleSerializer
+
+    serializer = PickleSerializer(Client(b'peer'))
+    payload = b'x' * 1024
+    frames = serializer.dumps(('name', (pickle.PickleBuffer(payload),), {}))
+    assert len(frames) == 2
+    assert bytes(frames[1]) == payload
+    name, (buffer,), kw = serializer.loads(frames)
+    assert bytes(buffer) == payload
+
+
+def test_raw_serializer():
+    from pseud import Client
+    from pseud.serializer import RawSerializer
+
+    serializer = RawSerializer(Client(b'peer'))
+    assert bytes(serializer.loads(serializer.dumps(b'data'))) == b'data'
+    with pytest.raises(TypeError):
+        serializer.dumps(('name', (), {}))
+
+
+@pytest.mark.asyncio
+async def test_pickle_negotiated_per_connection(loop):
+    from pseud import Client, Server
+
+    server = Server(b'server', loop=loop, accepted_serializers=('msgpack', 'pickle'))
+    client = Client(b'server', loop=loop, serializer='pickle')
+    server.bind(b'inproc://pickle')
+    client.connect(b'inproc://pickle')
+
+    @server.register_rpc
+    def unique(items):
+        return set(items)
+
+    async with server, client:
+        assert await client.unique([1, 1, 2]) == {1, 2}
+
+
+@pytest.mark.asyncio
+async def test_pickle_refused_by_default(loop):
+    from pseud import Client, Server
+    from pseud.interfaces import UnsupportedSerializerError
+
+    server = Server(b'server', loop=loop)
+    client = Client(b'server', loop=loop, serializer='pickle')
+    server.bind(b'inproc://pickle')
+    client.connect(b'inproc://pickle')
+
+    @server.register_rpc
+    def unique(items):
+        return set(items)
+
+    async with server, client:
+        with pytest.raises(UnsupportedSerializerError):
+            await client.unique([1, 1, 2])
+
+
+def test_packer_register_type():
+    import dataclasses
+    import enum
+    import typing
+
+    from pseud.packer import Packer
+
+    @dataclasses.dataclass(frozen=True)
+    class Point:
+        x: int
+        y: int = 0
+
+    @dataclasses.dataclass(slots=True)
+    class Event:
+        name: str
+        point: Point
+        when: dt.datetime
+        count: int = dataclasses.field(default=0, init=False)
+
+    class Pair(typing.NamedTuple):
+        left: int
+        right: str
+
+    class Color(enum.Enum):
+        RED = 'red'
+        BLUE = 'blue'
+
+    class Level(enum.IntEnum):
+        LOW = 1
+        HIGH = 2
+
+    packer = Packer()
+    for code, cls in enumerate((Point, Event, Color)):
+        packer.register_type(code, cls)
+    # tuples are packed as is until a native subclass is registered
+    assert not packer._strict_types
+    with pytest.raises(TypeError):
+        packer.register_type(3, Pair)
+    packer.register_type(3, Pair, strict_types=True)
+    packer.register_type(4, Level, strict_types=True)
+
+    event = Event('start', Point(1, 2), dt.datetime(2003, 9, 27, tzinfo=dt.timezone.utc))
+    event.count = 3
+    data = {
+        'event': event,
+        'pair': Pair(1, 'a'),
+        'colors': (Color.RED, Color.BLUE),
+        'level': Level.HIGH,
+        'plain': (1, (2, 3)),
+    }
+    result = packer.unpackb(packer.packb(data))
+    assert result == data
+    assert type(result['pair']) is Pair
+    assert result['level'] is Level.HIGH
+    assert result['plain'] == (1, (2, 3))
+    assert result['event'].count == 3
+
+    with pytest.raises(TypeError):
+        packer.register_type(10, dict)
+    # registration does not leak to other packers
+    with pytest.raises(TypeError):
+        Packer().packb(Point(1, 2))
+
+
+def test_estimate_size():
+    from pseud.common import estimate_size
+
+    assert estimate_size(b'x' * 100) == 100
+    assert estimate_size(('name', (b'x' * 100,), {'key': 'y' * 10})) == 114
+    assert estimate_size([b'x' * 10] * 1000) == 10000
+    assert estimate_size(None) == 8
+    # arguments of a work are wrapped in (args, kw)
+    work = (({'blob': b'x' * 4096},), {})
+    assert estimate_size(work) < 4096
+    assert estimate_size(work, depth=4) >= 4096
@@ -124,3 +124,89 @@ async def test_job_raise(loop):
         assert klass == 'ValueError'
         assert message == 'too bad'
         assert __file__ in traceback
+
+
+async def test_job_raise_without_traceback(loop):
+    from pseud import Server
+    from pseud.interfaces import ERROR, VERSION, WORK
+    from pseud.packer import Packer
+
+    user_id = b'echo'
+    endpoint = 'inproc://test_job_raise_without_traceback'
+    server = Server(user_id, loop=loop, traceback_mode='none', error_log_rate=None)
+    server.bind(endpoint)
+
+    @server.register_rpc
+    def job_buggy(*args, **kw):
+        raise ValueError('too bad')
+
+    socket = make_one_client_socket(endpoint)
+    work = Packer().packb(('job_buggy', (), {}))
+    async with server:
+        await socket.send_multipart([user_id, b'', VERSION, b'', WORK, work])
+        response = await socket.recv_multipart()
+        assert response[:-1] == [user_id, b'', VERSION, b'', ERROR]
+        assert Packer().unpackb(response[-1]) == ('ValueError', 'too bad', '')
+
+
+async def test_job_v2_layout_decodes_arguments_lazily(loop):
+    from pseud.interfaces import ERROR, OK, VERSION, VERSION_2, WORK
+    from pseud.packer import Packer
+
+    user_id = b'echo'
+    endpoint = 'inproc://test_job_v2_layout_decodes_arguments_lazily'
+    server = make_one_server(user_id, endpoint, loop)
+
+    @server.register_rpc
+    def add(a, b):
+        return a + b
+
+    socket = make_one_client_socket(endpoint)
+    async with server:
+        work = Packer().packb(((1,), {'b': 2}))
+        await socket.send_multipart([user_id, b'', VERSION_2, b'', WORK, b'add', work])
+        response = await socket.recv_multipart()
+        assert response == [user_id, b'', VERSION, b'', OK, Packer().packb(3)]
+
+        # arguments are not decoded, the locator is unknown
+        await socket.send_multipart(
+            [user_id, b'', VERSION_2, b'', WORK, b'unknown', b'\xc1garbage']
+        )
+        response = await socket.recv_multipart()
+        assert response[:-1] == [user_id, b'', VERSION, b'', ERROR]
+        klass, message, traceback = Packer().unpackb(response[-1])
+        assert klass == 'ServiceNotFoundError'
+
+
+async def test_malformed_work_batch(loop):
+    from pseud.interfaces import ERROR, OK, VERSION, WORK_BATCH
+    from pseud.packer import Packer
+
+    user_id = b'echo'
+    endpoint = 'inproc://test_malformed_work_batch'
+    server = make_one_server(user_id, endpoint, loop)
+
+    @server.register_rpc
+    def add(a, b):
+        return a + b
+
+    socket = make_one_client_socket(endpoint)
+    async with server:
+        await socket.send_multipart(
+            [user_id, b'', VERSION, b'1', WORK_BATCH, Packer().packb((True, 1))]
+        )
+        response = await socket.recv_multipart()
+        assert response[:-1] == [user_id, b'', VERSION, b'1', ERROR]
+        assert Packer().unpackb(response[-1])[0] == 'TypeError'
+
+        # only the malformed call fails
+        batch = (True, [1, ('add', (1, 2))])
+        await socket.send_multipart(
+            [user_id, b'', VERSION, b'2', WORK_BATCH, Packer().packb(batch)]
+        )
+        response = await socket.recv_multipart()
+        assert response[:-1] == [user_id, b'', VERSION, b'2', OK]
+        (failed, error), result = Packer().unpackb(response[-1])
+        assert not failed
+        assert error[0] == 'TypeError'
+        assert result == (True, 3)
@@ -0,0 +1,39 @@
+import os
+from collections import Counter
+
+import msgpack
+import pytest
+
+
+def test_shared_memory_transport(tmp_path):
+    from pseud.shm import SharedMemoryTransport
+
+    metrics = Counter()
+    transport = SharedMemoryTransport(4, metrics, str(tmp_path))
+    message = [b'peer', b'', b'v2', b'uid', b'\x03\x01', b'name', b'large body']
+    encoded = transport.encode(message)
+    assert encoded[4] == b'\x03\x81'
+    assert encoded[5:7] == [b'name', b'']
+    assert len(os.listdir(tmp_path)) == 1
+    # already moved
+    assert transport.encode(encoded) is encoded
+    assert transport.encode(message[:6]) == message[:6]
+
+    frames = transport.decode(encoded[5:])
+    assert bytes(frames[1]) == b'large body'
+    assert frames[1].readonly
+    assert os.listdir(tmp_path) == []
+    assert metrics['shared_memory_sent'] == metrics['shared_memory_received'] == 1
+
+    transport.encode(message)
+    transport.close()
+    assert os.listdir(tmp_path) == []
+    assert metrics['shared_memory_expired'] == 1
+
+
+def test_shared_memory_segment_names_are_checked(tmp_path):
+    from pseud.shm import SharedMemoryTransport
+
+    transport = SharedMemoryTransport(4, Counter(), str(tmp_path))
+    with pytest.raises(ValueError):
+        transport.decode([b'', msgpack.packb([(0, '../etc/passwd', 10)])])